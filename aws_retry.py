@@ -0,0 +1,212 @@
+import logging
+import os
+import random
+import threading
+import time
+from botocore.config import Config
+from botocore.exceptions import ClientError, HTTPClientError, IncompleteReadError
+from botocore.exceptions import ConnectionError as BotoConnectionError
+
+logger = logging.getLogger(__name__)
+
+# Los clientes no reintentan por su cuenta: todos los reintentos pasan por
+# RetryPolicy para que queden contabilizados y respeten el presupuesto.
+CLIENT_CONFIG = Config(retries={'max_attempts': 1, 'mode': 'standard'})
+
+THROTTLING_CODES = {
+    'Throttling',
+    'ThrottlingException',
+    'ThrottledException',
+    'RequestThrottled',
+    'RequestLimitExceeded',
+    'TooManyRequestsException',
+    'ProvisionedThroughputExceededException',
+    'SlowDown',
+}
+
+TRANSIENT_CODES = {
+    'InternalError',
+    'InternalFailure',
+    'InternalServerError',
+    'ServiceUnavailable',
+    'RequestTimeout',
+    'RequestTimeoutException',
+}
+
+THROTTLED = 'throttled'
+TRANSIENT = 'transient'
+FATAL = 'fatal'
+
+
+class CircuitOpenError(Exception):
+    """Se lanza cuando el circuito de un servicio está abierto y no se permiten llamadas."""
+
+
+def classify_error(error):
+    """Clasifica un error de AWS como 'throttled', 'transient' o 'fatal'."""
+    if isinstance(error, ClientError):
+        code = error.response.get('Error', {}).get('Code', '')
+        if code in THROTTLING_CODES:
+            return THROTTLED
+        if code in TRANSIENT_CODES:
+            return TRANSIENT
+        status = error.response.get('ResponseMetadata', {}).get('HTTPStatusCode', 0)
+        if status >= 500:
+            return TRANSIENT
+        return FATAL
+    # BotoConnectionError cubre EndpointConnectionError y ConnectTimeoutError;
+    # HTTPClientError cubre ReadTimeoutError, ConnectionClosedError y
+    # ResponseStreamingError (corte al leer el cuerpo de la respuesta).
+    if isinstance(error, (BotoConnectionError, HTTPClientError, IncompleteReadError)):
+        return TRANSIENT
+    return FATAL
+
+
+class CircuitBreaker:
+    """Abre el circuito tras `failure_threshold` fallos seguidos durante `reset_timeout` segundos.
+
+    Pasado ese tiempo el circuito queda semiabierto: se deja pasar una única
+    llamada de prueba y el resto se rechaza hasta conocer su resultado.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=60.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if not self.probing and self.clock() - self.opened_at >= self.reset_timeout:
+                # Semiabierto: solo esta llamada pasa hasta que se registre su resultado
+                self.probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def release_probe(self):
+        """Libera la llamada de prueba sin contarla (errores no recuperables): la siguiente probará de nuevo."""
+        with self.lock:
+            self.probing = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.probing or self.failures >= self.failure_threshold:
+                # La llamada de prueba falló: se vuelve a abrir el circuito
+                self.probing = False
+                self.opened_at = self.clock()
+
+
+class RetryPolicy:
+    """Reintentos con backoff exponencial y jitter, presupuesto por servicio y circuit breaker.
+
+    El presupuesto funciona como un cubo de fichas: cada reintento consume una
+    ficha y cada llamada correcta devuelve `budget_refill`. Sin fichas, el error
+    se propaga sin reintentar.
+    """
+
+    def __init__(self, service, max_attempts=8, base_delay=0.1, max_delay=20.0, budget=100,
+                 budget_refill=0.1, breaker=None, sleep=time.sleep, rng=random.random):
+        self.service = service
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_budget = budget
+        self.budget = float(budget)
+        self.budget_refill = budget_refill
+        self.breaker = breaker or CircuitBreaker()
+        self.sleep = sleep
+        self.rng = rng
+        self.lock = threading.Lock()
+        self.metrics = {'calls': 0, 'retries': 0, 'throttled': 0, 'transient': 0,
+                        'failures': 0, 'circuit_open': 0}
+
+    def backoff(self, attempt):
+        """Full jitter: espera aleatoria entre 0 y min(max_delay, base_delay * 2^intento)."""
+        return self.rng() * min(self.max_delay, self.base_delay * (2 ** attempt))
+
+    def _take_budget(self):
+        with self.lock:
+            if self.budget < 1:
+                return False
+            self.budget -= 1
+            return True
+
+    def _count(self, metric):
+        with self.lock:
+            self.metrics[metric] += 1
+
+    def call(self, func, *args, **kwargs):
+        """Ejecuta `func(*args, **kwargs)` reintentando los errores recuperables."""
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                self._count('circuit_open')
+                raise CircuitOpenError(f"Circuito abierto para {self.service}; se omite la llamada.")
+            self._count('calls')
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                kind = classify_error(e)
+                if kind == FATAL:
+                    self.breaker.release_probe()
+                    raise
+                self._count(kind)
+                self.breaker.record_failure()
+                attempt += 1
+                if attempt >= self.max_attempts or not self._take_budget():
+                    self._count('failures')
+                    logger.error(f"{self.service}: se agotaron los reintentos tras {attempt} intentos: {e}")
+                    raise
+                self._count('retries')
+                delay = self.backoff(attempt)
+                logger.warning(f"{self.service}: error {kind} ({e}); reintento {attempt} en {delay:.2f}s.")
+                self.sleep(delay)
+                continue
+            self.breaker.record_success()
+            with self.lock:
+                self.budget = min(self.max_budget, self.budget + self.budget_refill)
+            return result
+
+
+_policies = {}
+_policies_lock = threading.Lock()
+
+
+def get_retry_policy(service):
+    """Devuelve la política compartida de un servicio ('dynamodb', 's3', 'glue', ...)."""
+    with _policies_lock:
+        if service not in _policies:
+            prefix = f'RETRY_{service.upper()}_'
+            _policies[service] = RetryPolicy(
+                service,
+                max_attempts=int(os.getenv(f'{prefix}MAX_ATTEMPTS', '8')),
+                budget=int(os.getenv(f'{prefix}BUDGET', '100')),
+                breaker=CircuitBreaker(
+                    failure_threshold=int(os.getenv(f'{prefix}BREAKER_THRESHOLD', '10')),
+                    reset_timeout=float(os.getenv(f'{prefix}BREAKER_RESET', '60'))
+                )
+            )
+        return _policies[service]
+
+
+def retry_metrics():
+    """Métricas de reintentos por servicio."""
+    with _policies_lock:
+        return {service: dict(policy.metrics) for service, policy in _policies.items()}
+
+
+def log_retry_metrics():
+    for service, metrics in retry_metrics().items():
+        logger.info(f"Métricas de reintentos {service}: {metrics}")
@@ -0,0 +1,69 @@
+import logging
+import os
+import threading
+import boto3
+
+logger = logging.getLogger(__name__)
+
+# Sesión de boto3 compartida por proceso. En ejecuciones puntuales no cambia
+# nada; en el scheduler residente evita recrear la sesión y los clientes (y sus
+# conexiones TLS) en cada ejecución de un trabajo. Las credenciales temporales
+# de LabRole se renuevan reescribiendo ~/.aws/credentials (montado en los
+# contenedores), así que la sesión se recrea cuando ese archivo cambia.
+
+
+class CachedClientSession(boto3.Session):
+    """Sesión que reutiliza los clientes creados para el mismo servicio, región y configuración."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._clients = {}
+        self._clients_lock = threading.Lock()
+
+    def client(self, service_name, region_name=None, config=None, **kwargs):
+        if kwargs:
+            return super().client(service_name, region_name=region_name, config=config, **kwargs)
+        key = (service_name, region_name, id(config))
+        with self._clients_lock:
+            if key not in self._clients:
+                self._clients[key] = super().client(service_name, region_name=region_name, config=config)
+            return self._clients[key]
+
+
+_shared_session = None
+_shared_credentials = None
+_shared_session_lock = threading.Lock()
+
+
+def credentials_signature():
+    """Ruta, fecha de modificación y tamaño del archivo de credenciales (None si no existe)."""
+    path = os.path.expanduser(os.getenv('AWS_SHARED_CREDENTIALS_FILE', '~/.aws/credentials'))
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return path, stat.st_mtime_ns, stat.st_size
+
+
+def get_shared_session():
+    """Devuelve la sesión compartida del proceso.
+
+    Se crea la primera vez y de nuevo, con sus clientes, cuando cambia el
+    archivo de credenciales o tras invalidate_shared_session.
+    """
+    global _shared_session, _shared_credentials
+    signature = credentials_signature()
+    with _shared_session_lock:
+        if _shared_session is None or signature != _shared_credentials:
+            if _shared_session is not None:
+                logger.info("El archivo de credenciales de AWS cambió; se recrea la sesión compartida.")
+            _shared_session = CachedClientSession(region_name=os.getenv('AWS_REGION', 'us-east-1'))
+            _shared_credentials = signature
+        return _shared_session
+
+
+def invalidate_shared_session():
+    """Descarta la sesión compartida (p. ej. tras ExpiredTokenException); la siguiente llamada crea otra."""
+    global _shared_session
+    with _shared_session_lock:
+        _shared_session = None
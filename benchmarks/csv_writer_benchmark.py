@@ -0,0 +1,85 @@
+"""Compara el escritor CSV con pandas en tiempo y memoria pico.
+
+Uso: python benchmarks/csv_writer_benchmark.py [--rows 200000] [--columns 20]
+
+Los elementos imitan la salida de transform_items (cadenas, números, booleanos
+y atributos ausentes). No requiere AWS ni MySQL.
+"""
+import argparse
+import gc
+import io
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from csv_writer import csv_upload_stream  # noqa: E402
+
+
+def make_items(rows, columns, seed=42):
+    rng = random.Random(seed)
+    items = []
+    for i in range(rows):
+        item = {'id': f'item-{i}'}
+        for c in range(columns):
+            if rng.random() < 0.1:
+                continue  # atributo ausente
+            kind = c % 4
+            if kind == 0:
+                item[f'col{c}'] = rng.random() * 1000
+            elif kind == 1:
+                item[f'col{c}'] = float(rng.randint(0, 10 ** 6))
+            elif kind == 2:
+                item[f'col{c}'] = rng.random() < 0.5
+            else:
+                item[f'col{c}'] = f'texto, "{rng.randint(0, 10 ** 6)}"'
+        items.append(item)
+    return items
+
+
+def pandas_upload_stream(items):
+    import pandas as pd
+
+    buffer = io.BytesIO()
+    buffer.write(pd.DataFrame(items).to_csv(index=False).encode('utf-8'))
+    buffer.seek(0)
+    return buffer
+
+
+def measure(label, func, items, repeat):
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func(items)
+        timings.append(time.perf_counter() - start)
+    gc.collect()
+    tracemalloc.start()
+    size = len(func(items).getvalue())
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    best = min(timings)
+    print(f"{label:<10} {best:8.3f}s  {len(items) / best:12,.0f} filas/s  pico {peak / 1024 ** 2:8.1f} MiB  ({size / 1024 ** 2:.1f} MiB CSV)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--columns', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    items = make_items(args.rows, args.columns)
+    print(f"{args.rows} filas x {args.columns + 1} columnas, mejor de {args.repeat}")
+    measure('csv_writer', csv_upload_stream, items, args.repeat)
+    try:
+        measure('pandas', pandas_upload_stream, items, args.repeat)
+    except ImportError:
+        print("pandas no está instalado; se omite la comparación.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,344 @@
+import hashlib
+import json
+import logging
+import math
+import numbers
+import os
+import re
+import time
+
+logger = logging.getLogger(__name__)
+
+# Estadísticas por columna calculadas en streaming durante la ingesta.
+# Todas las estructuras son combinables (merge), de modo que se pueden
+# calcular por página o por archivo de exportación y unir al final.
+
+
+NUMBER_PATTERN = re.compile(r'-?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?')
+
+# Grupo en el que se acumulan las claves que superan el límite de grupos
+OVERFLOW_GROUP = '__otros__'
+
+
+def _is_number(value):
+    return isinstance(value, numbers.Number) and not isinstance(value, bool) and not (
+        isinstance(value, float) and math.isnan(value))
+
+
+def _decode_number(value):
+    """Convierte en número una cadena numérica (atributo N sin tipar); el resto no cambia."""
+    if isinstance(value, str) and NUMBER_PATTERN.fullmatch(value):
+        return int(value) if value.lstrip('-').isdigit() else float(value)
+    return value
+
+
+class HyperLogLog:
+    """Conteo aproximado de valores distintos (error típico ~1.04/sqrt(2^p))."""
+
+    def __init__(self, precision=12):
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(self.size)
+
+    def add(self, value):
+        digest = hashlib.blake2b(str(value).encode('utf-8'), digest_size=8).digest()
+        hashed = int.from_bytes(digest, 'big')
+        index = hashed >> (64 - self.precision)
+        remaining = hashed & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - remaining.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        for i, rank in enumerate(other.registers):
+            if rank > self.registers[i]:
+                self.registers[i] = rank
+
+    def count(self):
+        alpha = 0.7213 / (1 + 1.079 / self.size)
+        estimate = alpha * self.size * self.size / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * self.size and zeros:
+            # Corrección para cardinalidades pequeñas (linear counting)
+            estimate = self.size * math.log(self.size / zeros)
+        return int(round(estimate))
+
+
+class QuantileSketch:
+    """Sketch de cuantiles estilo t-digest: centroides (media, peso) más finos en los extremos."""
+
+    def __init__(self, compression=100):
+        self.compression = compression
+        self.centroids = []
+        self.buffer = []
+
+    def add(self, value):
+        self.buffer.append(float(value))
+        if len(self.buffer) >= self.compression * 5:
+            self._compress()
+
+    def merge(self, other):
+        self.centroids.extend(other.centroids)
+        self.buffer.extend(other.buffer)
+        self._compress()
+
+    def _compress(self):
+        points = sorted(self.centroids + [(value, 1) for value in self.buffer])
+        self.buffer = []
+        total = sum(weight for _, weight in points)
+        merged = []
+        cumulative = 0
+        for mean, weight in points:
+            if merged:
+                last_mean, last_weight = merged[-1]
+                q = (cumulative + (last_weight + weight) / 2) / total
+                limit = 4 * total * q * (1 - q) / self.compression
+                if last_weight + weight <= max(1, limit):
+                    combined = last_weight + weight
+                    merged[-1] = ((last_mean * last_weight + mean * weight) / combined, combined)
+                    continue
+                cumulative += last_weight
+            merged.append((mean, weight))
+        self.centroids = merged
+
+    def quantile(self, q):
+        self._compress()
+        if not self.centroids:
+            return None
+        total = sum(weight for _, weight in self.centroids)
+        target = q * total
+        cumulative = 0
+        previous_mean, previous_center = self.centroids[0][0], 0
+        for mean, weight in self.centroids:
+            center = cumulative + weight / 2
+            if target <= center:
+                if center == previous_center:
+                    return mean
+                fraction = (target - previous_center) / (center - previous_center)
+                return previous_mean + fraction * (mean - previous_mean)
+            previous_mean, previous_center = mean, center
+            cumulative += weight
+        return self.centroids[-1][0]
+
+
+class TopK:
+    """Valores más frecuentes con el algoritmo Misra-Gries (k contadores)."""
+
+    def __init__(self, k=10):
+        self.k = k
+        self.counters = {}
+
+    def add(self, value):
+        if value in self.counters:
+            self.counters[value] += 1
+        elif len(self.counters) < self.k:
+            self.counters[value] = 1
+        else:
+            for key in list(self.counters):
+                self.counters[key] -= 1
+                if self.counters[key] == 0:
+                    del self.counters[key]
+
+    def merge(self, other):
+        for value, count in other.counters.items():
+            self.counters[value] = self.counters.get(value, 0) + count
+        if len(self.counters) > self.k:
+            threshold = sorted(self.counters.values(), reverse=True)[self.k]
+            self.counters = {v: c - threshold for v, c in self.counters.items() if c > threshold}
+
+    def top(self):
+        return sorted(self.counters.items(), key=lambda item: item[1], reverse=True)
+
+
+class ColumnStats:
+    """Agregados de una columna: conteo, min/max/suma numéricos, distintos, cuantiles y top-k."""
+
+    def __init__(self, top_k=10):
+        self.count = 0
+        self.numeric_count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+        self.distinct = HyperLogLog()
+        self.quantiles = QuantileSketch()
+        self.top = TopK(top_k)
+
+    def add(self, value):
+        self.count += 1
+        self.distinct.add(value)
+        if _is_number(value):
+            self.numeric_count += 1
+            self.sum += value
+            self.min = value if self.min is None else min(self.min, value)
+            self.max = value if self.max is None else max(self.max, value)
+            self.quantiles.add(value)
+        else:
+            self.top.add(value if isinstance(value, (str, bool)) else str(value))
+
+    def merge(self, other):
+        self.count += other.count
+        self.numeric_count += other.numeric_count
+        self.sum += other.sum
+        for bound, pick in (('min', min), ('max', max)):
+            values = [v for v in (getattr(self, bound), getattr(other, bound)) if v is not None]
+            setattr(self, bound, pick(values) if values else None)
+        self.distinct.merge(other.distinct)
+        self.quantiles.merge(other.quantiles)
+        self.top.merge(other.top)
+
+    def to_dict(self, rows):
+        nulls = rows - self.count
+        result = {
+            'count': self.count,
+            'nulls': nulls,
+            'null_rate': nulls / rows if rows else 0.0,
+            'distinct': self.distinct.count(),
+        }
+        if self.numeric_count:
+            result.update({
+                'min': self.min,
+                'max': self.max,
+                'sum': self.sum,
+                'p50': self.quantiles.quantile(0.5),
+                'p95': self.quantiles.quantile(0.95),
+            })
+        if self.top.counters:
+            result['top'] = [[value, count] for value, count in self.top.top()]
+        return result
+
+
+class TableStats:
+    """Estadísticas de todas las columnas de una tabla, con agrupación opcional por claves.
+
+    Se guardan como mucho `max_groups` grupos; las claves nuevas a partir de
+    ese límite se acumulan en el grupo OVERFLOW_GROUP. Con `decode_numbers`
+    las cadenas numéricas cuentan como números (servicios que conservan los
+    atributos N como texto).
+    """
+
+    def __init__(self, group_by=None, max_groups=10000, decode_numbers=False):
+        self.group_by = list(group_by or [])
+        self.max_groups = max_groups
+        self.decode_numbers = decode_numbers
+        self.rows = 0
+        self.columns = {}
+        self.groups = {}
+
+    def empty_copy(self):
+        """TableStats vacío con la misma configuración, para calcular por partes y combinar."""
+        return TableStats(group_by=self.group_by, max_groups=self.max_groups, decode_numbers=self.decode_numbers)
+
+    def update(self, items):
+        """Actualiza las estadísticas con una página (lista de elementos ya transformados)."""
+        for item in items:
+            self.rows += 1
+            if self.decode_numbers:
+                item = {column: _decode_number(value) for column, value in item.items()}
+            for column, value in item.items():
+                if value is None or (isinstance(value, float) and math.isnan(value)):
+                    continue
+                stats = self.columns.get(column)
+                if stats is None:
+                    stats = self.columns[column] = ColumnStats()
+                stats.add(value)
+            if self.group_by:
+                self._update_group(item)
+
+    def _group(self, key):
+        if key not in self.groups and len(self.groups) >= self.max_groups:
+            key = (OVERFLOW_GROUP,) * len(self.group_by)
+        return self.groups.setdefault(key, {'count': 0, 'sums': {}})
+
+    def _update_group(self, item):
+        group = self._group(tuple(str(item.get(column)) for column in self.group_by))
+        group['count'] += 1
+        for column, value in item.items():
+            if column not in self.group_by and _is_number(value):
+                group['sums'][column] = group['sums'].get(column, 0) + value
+
+    def merge(self, other):
+        self.rows += other.rows
+        for column, stats in other.columns.items():
+            if column in self.columns:
+                self.columns[column].merge(stats)
+            else:
+                self.columns[column] = stats
+        for key, group in other.groups.items():
+            target = self._group(key)
+            target['count'] += group['count']
+            for column, value in group['sums'].items():
+                target['sums'][column] = target['sums'].get(column, 0) + value
+
+    def to_dict(self):
+        result = {
+            'rows': self.rows,
+            'computed_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'columns': {column: stats.to_dict(self.rows) for column, stats in self.columns.items()},
+        }
+        if self.group_by:
+            result['group_by'] = self.group_by
+            result['groups'] = [
+                dict(zip(self.group_by, key), count=group['count'], sums=group['sums'])
+                for key, group in self.groups.items()
+            ]
+        return result
+
+
+def stats_from_env(decode_numbers=False):
+    """Crea un TableStats si COMPUTE_STATS=true.
+
+    STATS_GROUP_BY: columnas separadas por comas; STATS_MAX_GROUPS: límite de grupos.
+    """
+    if os.getenv('COMPUTE_STATS', 'false').lower() != 'true':
+        return None
+    group_by = [column.strip() for column in os.getenv('STATS_GROUP_BY', '').split(',') if column.strip()]
+    return TableStats(group_by=group_by, max_groups=int(os.getenv('STATS_MAX_GROUPS', '10000')),
+                      decode_numbers=decode_numbers)
+
+
+def stats_to_json(stats):
+    return json.dumps(stats.to_dict(), indent=4, ensure_ascii=False, default=str)
+
+
+def save_stats_to_mysql(stats, source_table):
+    """Reemplaza las estadísticas de `source_table` en la tabla MySQL ingest_column_stats."""
+    # Importación diferida: etl_service configura su logging al importarse
+    import mysql.connector
+    from etl_service import get_mysql_connection, get_mysql_pool
+
+    rows = [
+        (source_table, column, values['count'], values['nulls'], values['null_rate'], values['distinct'],
+         values.get('min'), values.get('max'), values.get('sum'), values.get('p50'), values.get('p95'),
+         json.dumps(values.get('top'), ensure_ascii=False, default=str))
+        for column, values in stats.to_dict()['columns'].items()
+    ]
+    conn = None
+    try:
+        conn = get_mysql_connection(get_mysql_pool())
+        cursor = conn.cursor()
+        cursor.execute(
+            'CREATE TABLE IF NOT EXISTS `ingest_column_stats` ('
+            '`source_table` VARCHAR(255) NOT NULL, `column_name` VARCHAR(255) NOT NULL, '
+            '`count` BIGINT, `nulls` BIGINT, `null_rate` DOUBLE, `distinct_count` BIGINT, '
+            '`min_value` DOUBLE, `max_value` DOUBLE, `sum_value` DOUBLE, `p50` DOUBLE, `p95` DOUBLE, '
+            '`top_values` TEXT, `computed_at` TIMESTAMP DEFAULT CURRENT_TIMESTAMP, '
+            'PRIMARY KEY (`source_table`, `column_name`))'
+        )
+        cursor.execute('DELETE FROM `ingest_column_stats` WHERE `source_table` = %s', (source_table,))
+        cursor.executemany(
+            'INSERT INTO `ingest_column_stats` (`source_table`, `column_name`, `count`, `nulls`, `null_rate`, '
+            '`distinct_count`, `min_value`, `max_value`, `sum_value`, `p50`, `p95`, `top_values`) '
+            'VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)',
+            rows
+        )
+        conn.commit()
+        cursor.close()
+        logger.info(f"Estadísticas de {source_table} guardadas en MySQL ({len(rows)} columnas).")
+    except mysql.connector.Error as err:
+        logger.error(f"Error al guardar las estadísticas en MySQL: {err}")
+        if conn is not None:
+            conn.rollback()
+    finally:
+        # Con pool, close() devuelve la conexión en lugar de cerrarla
+        if conn is not None:
+            conn.close()
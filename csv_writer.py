@@ -0,0 +1,153 @@
+import csv
+import io
+import numbers
+
+# Escritor CSV basado en el módulo csv, sin pasar por pandas.DataFrame.
+# Reproduce la salida de `pd.DataFrame(items).to_csv(index=False)`:
+# - columnas en el orden en que aparecen por primera vez en los elementos
+# - atributos ausentes (o None) como campos vacíos
+# - columnas numéricas con enteros y flotantes/ausentes se escriben como flotantes
+
+
+def collect_fieldnames(items):
+    """Recorre los elementos una vez y devuelve las columnas en orden de aparición."""
+    fieldnames = {}
+    for item in items:
+        for key in item:
+            if key not in fieldnames:
+                fieldnames[key] = None
+    return list(fieldnames)
+
+
+def _is_number(value):
+    return isinstance(value, numbers.Number) and not isinstance(value, bool)
+
+
+def find_float_columns(items, fieldnames):
+    """Devuelve las columnas que pandas convertiría a float64.
+
+    Una columna es float64 cuando todos sus valores presentes son numéricos y
+    alguno es flotante o falta en algún elemento (NaN fuerza el tipo flotante).
+    """
+    float_columns = set()
+    for column in fieldnames:
+        has_float = False
+        has_missing = False
+        numeric = True
+        has_values = False
+        for item in items:
+            value = item.get(column)
+            if value is None:
+                has_missing = True
+                continue
+            has_values = True
+            if not _is_number(value):
+                numeric = False
+                break
+            if isinstance(value, float):
+                has_float = True
+        if numeric and has_values and (has_float or has_missing):
+            float_columns.add(column)
+    return float_columns
+
+
+class ColumnProfile:
+    """Columnas y tipos observados, acumulables por partes y combinables con `merge`.
+
+    Permite fijar un mismo esquema (orden de columnas y columnas flotantes)
+    para varios archivos que se escriben por separado.
+    """
+
+    def __init__(self):
+        # columna -> [todos los valores son numéricos, hay flotantes, valores presentes]
+        self.columns = {}
+        self.rows = 0
+
+    def update(self, items):
+        for item in items:
+            self.rows += 1
+            for key, value in item.items():
+                column = self.columns.setdefault(key, [True, False, 0])
+                if value is None:
+                    continue
+                column[2] += 1
+                if not _is_number(value):
+                    column[0] = False
+                elif isinstance(value, float):
+                    column[1] = True
+
+    def merge(self, other):
+        for key, (numeric, has_float, present) in other.columns.items():
+            column = self.columns.setdefault(key, [True, False, 0])
+            column[0] = column[0] and numeric
+            column[1] = column[1] or has_float
+            column[2] += present
+        self.rows += other.rows
+
+    @property
+    def fieldnames(self):
+        return list(self.columns)
+
+    def float_columns(self):
+        """Mismo criterio que find_float_columns sobre todas las filas observadas."""
+        return {
+            key for key, (numeric, has_float, present) in self.columns.items()
+            if numeric and present and (has_float or present < self.rows)
+        }
+
+
+def _format_value(value, as_float):
+    if value is None:
+        return ''
+    if as_float and _is_number(value):
+        return repr(float(value))
+    if isinstance(value, float):
+        return repr(value)
+    return value
+
+
+def write_csv(items, stream, fieldnames=None, float_columns=None):
+    """Escribe los elementos como CSV directamente en `stream` (modo texto).
+
+    Si no se indican `fieldnames` y `float_columns` se calculan con una
+    primera pasada sobre los elementos; si se indican ambos (p. ej. desde un
+    ColumnProfile) `items` se recorre una sola vez y puede ser un iterador.
+    Devuelve el número de filas escritas.
+    """
+    if fieldnames is None:
+        fieldnames = collect_fieldnames(items)
+    if float_columns is None:
+        float_columns = find_float_columns(items, fieldnames)
+
+    writer = csv.writer(stream, lineterminator='\n')
+    if not fieldnames:
+        # Sin elementos no hay columnas: solo se escribe una línea vacía
+        stream.write('\n')
+        return 0
+
+    writer.writerow(fieldnames)
+    rows = 0
+    for item in items:
+        writer.writerow([
+            _format_value(item.get(column), column in float_columns)
+            for column in fieldnames
+        ])
+        rows += 1
+    return rows
+
+
+def csv_upload_stream(items, encoding='utf-8'):
+    """Serializa los elementos en un buffer binario listo para `put_object`."""
+    buffer = io.BytesIO()
+    text_stream = io.TextIOWrapper(buffer, encoding=encoding, newline='')
+    write_csv(items, text_stream)
+    text_stream.flush()
+    text_stream.detach()
+    buffer.seek(0)
+    return buffer
+
+
+def save_csv_file(items, file_name, encoding='utf-8'):
+    """Escribe los elementos en un archivo CSV local."""
+    with open(file_name, 'w', newline='', encoding=encoding) as f:
+        return write_csv(items, f)
@@ -0,0 +1,316 @@
+import glob
+import gzip
+import json
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from aws_retry import CLIENT_CONFIG, get_retry_policy
+from csv_writer import ColumnProfile, write_csv
+from log_config import ProgressLogger
+from sinks import remove_stale_outputs
+
+logger = logging.getLogger(__name__)
+
+# Ingesta a partir de las exportaciones nativas de DynamoDB (point-in-time
+# export) en lugar de un scan. La exportación no consume capacidad de lectura.
+# La conversión tiene dos fases para que todas las partes compartan el mismo
+# esquema (Glue/Athena leen las columnas CSV por posición):
+#   1. cada archivo .json.gz se lee en streaming, se transforma por lotes con
+#      transform_items y se guarda como JSON Lines en un directorio temporal,
+#      acumulando sus columnas en un ColumnProfile;
+#   2. con los perfiles combinados, cada parte se escribe con las mismas
+#      columnas y en el mismo orden.
+# Ambas fases procesan los archivos en paralelo y sin cargarlos en memoria.
+
+EXPORT_BATCH_SIZE = 1000
+
+
+def read_export_items(stream):
+    """Descomprime y decodifica un archivo de exportación en formato DynamoDB JSON.
+
+    Cada línea es {"Item": {...}} con los atributos tipados igual que en un scan.
+    """
+    with gzip.open(stream, 'rt', encoding='utf-8') as lines:
+        for line in lines:
+            if line.strip():
+                yield json.loads(line)['Item']
+
+
+def _batches(items, batch_size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def spool_export_file(source, spool_file, transform, stats=None, batch_size=EXPORT_BATCH_SIZE, progress=None):
+    """Fase 1: transforma un archivo .json.gz por lotes y guarda las filas como JSON Lines.
+
+    `source` es una ruta o un objeto archivo binario. Si se indica `stats`
+    (TableStats) se actualiza con las filas y con `progress` (ProgressLogger)
+    se informa cada lote. Devuelve el ColumnProfile del archivo.
+    """
+    profile = ColumnProfile()
+    name = os.path.basename(spool_file)
+    with open(spool_file, 'w', encoding='utf-8') as spool:
+        for number, batch in enumerate(_batches(read_export_items(source), batch_size), 1):
+            items = transform(batch)
+            profile.update(items)
+            if stats is not None:
+                stats.update(items)
+            if progress is not None:
+                progress.update(len(items), detail=f"{name} lote {number}: {len(items)} filas")
+            for item in items:
+                spool.write(json.dumps(item, ensure_ascii=False))
+                spool.write('\n')
+    return profile
+
+
+def read_spool(spool_file):
+    with open(spool_file, encoding='utf-8') as spool:
+        for line in spool:
+            yield json.loads(line)
+
+
+def write_json_array(items, stream):
+    """Escribe los elementos como `json.dump(items, indent=4)` pero elemento a elemento."""
+    rows = 0
+    for item in items:
+        stream.write(',\n' if rows else '[\n')
+        stream.write('\n'.join('    ' + line for line in json.dumps(item, indent=4).splitlines()))
+        rows += 1
+    stream.write('\n]' if rows else '[]')
+    return rows
+
+
+def encode_items(items, stream, file_format='csv', profile=None):
+    """Escribe los elementos transformados en `stream` (texto) como CSV o JSON.
+
+    Con `profile` (ColumnProfile) las columnas CSV son las del perfil y
+    `items` se recorre una sola vez.
+    """
+    if file_format == 'csv':
+        if profile is None:
+            return write_csv(items, stream)
+        return write_csv(items, stream, profile.fieldnames, profile.float_columns())
+    return write_json_array(items, stream)
+
+
+def write_part(spool_file, destination, file_format='csv', profile=None):
+    """Fase 2: escribe una parte a partir de su spool con el esquema común."""
+    with open(destination, 'w', newline='', encoding='utf-8') as f:
+        return encode_items(read_spool(spool_file), f, file_format, profile)
+
+
+def convert_export_file(source, destination, transform, file_format='csv', stats=None):
+    """Convierte un único archivo .json.gz de la exportación a CSV/JSON (ruta `destination`).
+
+    Devuelve el número de filas escritas.
+    """
+    with tempfile.TemporaryDirectory(prefix='dynamodb-export-', dir=os.getenv('EXPORT_TMP_DIR') or None) as spool_dir:
+        spool_file = os.path.join(spool_dir, 'part.jsonl')
+        profile = spool_export_file(source, spool_file, transform, stats)
+        return write_part(spool_file, destination, file_format, profile)
+
+
+def part_name(index, file_format='csv'):
+    return f"part-{index:05d}.{file_format}"
+
+
+def _part_stats(stats):
+    """Estadísticas independientes por archivo; se combinan con merge al terminar."""
+    return stats.empty_copy() if stats is not None else None
+
+
+def spool_parts(sources, spool_dir, transform, open_source=None, retry_policy=None, max_workers=None, stats=None):
+    """Fase 1 en paralelo para todos los archivos de la exportación.
+
+    `open_source(source)` devuelve el objeto archivo binario a leer (por
+    defecto `source` es una ruta). Con `retry_policy` cada archivo se
+    reintenta completo. Devuelve las rutas de los spools y el ColumnProfile
+    combinado en el orden de las partes.
+    """
+    spool_files = [os.path.join(spool_dir, f'part-{i:05d}.jsonl') for i in range(len(sources))]
+    profiles = [None] * len(sources)
+    part_stats = [None] * len(sources)
+    # Compartido por todos los hilos; un archivo reintentado se cuenta de nuevo
+    progress = ProgressLogger(logger, f"Conversión de {len(sources)} archivos de exportación", sample_every=100)
+
+    def spool(index):
+        def attempt():
+            body = open_source(sources[index]) if open_source else sources[index]
+            try:
+                # Estadísticas nuevas en cada intento para no contar dos veces un reintento
+                part_stats[index] = _part_stats(stats)
+                profiles[index] = spool_export_file(body, spool_files[index], transform, part_stats[index],
+                                                     progress=progress)
+            finally:
+                if open_source:
+                    body.close()
+        return retry_policy.call(attempt) if retry_policy else attempt()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for future in [executor.submit(spool, i) for i in range(len(sources))]:
+            future.result()
+    progress.done()
+
+    profile = ColumnProfile()
+    for part_profile in profiles:
+        profile.merge(part_profile)
+    if stats is not None:
+        for part in part_stats:
+            stats.merge(part)
+    return spool_files, profile
+
+
+def convert_local_export(export_dir, output_dir, transform, file_format='csv', max_workers=None, stats=None):
+    """Convierte en paralelo una exportación descargada en disco (carpeta con data/*.json.gz).
+
+    Las partes `part-NNNNN` de conversiones anteriores que sobren se eliminan.
+    """
+    sources = sorted(glob.glob(os.path.join(export_dir, '**', '*.json.gz'), recursive=True))
+    os.makedirs(output_dir, exist_ok=True)
+    with tempfile.TemporaryDirectory(prefix='dynamodb-export-', dir=os.getenv('EXPORT_TMP_DIR') or None) as spool_dir:
+        spool_files, profile = spool_parts(sources, spool_dir, transform, max_workers=max_workers, stats=stats)
+        destinations = [os.path.join(output_dir, part_name(i, file_format)) for i in range(len(sources))]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(write_part, spool_file, destination, file_format, profile)
+                for spool_file, destination in zip(spool_files, destinations)
+            ]
+            rows = sum(future.result() for future in futures)
+
+    for path in glob.glob(os.path.join(output_dir, 'part-[0-9][0-9][0-9][0-9][0-9].*')):
+        if path not in destinations and path.endswith(('.csv', '.json')):
+            os.remove(path)
+    logger.info(f"Convertidos {len(sources)} archivos de exportación ({rows} filas) en {output_dir}.")
+    return rows
+
+
+def start_table_export(session, table_name, bucket_name, prefix):
+    """Lanza una exportación point-in-time de la tabla hacia S3 (requiere PITR habilitado)."""
+    dynamodb = session.client('dynamodb', config=CLIENT_CONFIG)
+    retry_policy = get_retry_policy('dynamodb')
+    table_arn = retry_policy.call(dynamodb.describe_table, TableName=table_name)['Table']['TableArn']
+    response = retry_policy.call(
+        dynamodb.export_table_to_point_in_time,
+        TableArn=table_arn,
+        S3Bucket=bucket_name,
+        S3Prefix=prefix,
+        ExportFormat='DYNAMODB_JSON'
+    )
+    export_arn = response['ExportDescription']['ExportArn']
+    logger.info(f"Exportación de {table_name} iniciada: {export_arn}")
+    return export_arn
+
+
+def find_latest_export(session, table_name, max_age_hours):
+    """Busca la exportación completada más reciente de la tabla con antigüedad menor a `max_age_hours`."""
+    dynamodb = session.client('dynamodb', config=CLIENT_CONFIG)
+    retry_policy = get_retry_policy('dynamodb')
+    table_arn = retry_policy.call(dynamodb.describe_table, TableName=table_name)['Table']['TableArn']
+    list_kwargs = {'TableArn': table_arn}
+    latest = None
+    while True:
+        response = retry_policy.call(dynamodb.list_exports, **list_kwargs)
+        for summary in response.get('ExportSummaries', []):
+            if summary['ExportStatus'] != 'COMPLETED':
+                continue
+            description = retry_policy.call(dynamodb.describe_export, ExportArn=summary['ExportArn'])['ExportDescription']
+            if latest is None or description['ExportTime'] > latest['ExportTime']:
+                latest = description
+        if 'NextToken' not in response:
+            break
+        list_kwargs['NextToken'] = response['NextToken']
+
+    if latest is None:
+        return None
+    age_hours = (time.time() - latest['ExportTime'].timestamp()) / 3600
+    if age_hours > max_age_hours:
+        return None
+    return latest['ExportArn']
+
+
+def wait_for_export(session, export_arn, poll_interval=30, timeout=3600):
+    """Espera a que la exportación termine y devuelve su descripción."""
+    dynamodb = session.client('dynamodb', config=CLIENT_CONFIG)
+    deadline = time.monotonic() + timeout
+    while True:
+        description = get_retry_policy('dynamodb').call(dynamodb.describe_export, ExportArn=export_arn)['ExportDescription']
+        status = description['ExportStatus']
+        logger.info(f"Estado de la exportación {export_arn}: {status}")
+        if status == 'COMPLETED':
+            return description
+        if status == 'FAILED':
+            raise RuntimeError(f"La exportación {export_arn} falló: {description.get('FailureMessage')}")
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"La exportación {export_arn} no terminó en {timeout}s.")
+        time.sleep(poll_interval)
+
+
+def list_export_data_files(s3, bucket_name, manifest_summary_key):
+    """Lee manifest-files.json (junto al manifest-summary.json) y devuelve las claves de los datos."""
+    manifest_key = manifest_summary_key.rsplit('/', 1)[0] + '/manifest-files.json'
+    body = get_retry_policy('s3').call(s3.get_object, Bucket=bucket_name, Key=manifest_key)['Body'].read()
+    return [json.loads(line)['dataFileS3Key'] for line in body.decode('utf-8').splitlines() if line.strip()]
+
+
+def convert_s3_export(session, description, output_bucket, output_prefix, transform, file_format='csv',
+                      max_workers=None, stats=None):
+    """Convierte en paralelo los archivos de una exportación y los sube como partes a S3.
+
+    Las partes se suben como `{output_prefix}-part-NNNNN.{formato}`, todas con
+    las mismas columnas. Después se borran el archivo del scan y las partes de
+    exportaciones anteriores que no se hayan reemplazado.
+    """
+    s3 = session.client('s3', config=CLIENT_CONFIG)
+    retry_policy = get_retry_policy('s3')
+    export_bucket = description['S3Bucket']
+    data_keys = list_export_data_files(s3, export_bucket, description['ExportManifest'])
+    part_keys = [f"{output_prefix}-{part_name(i, file_format)}" for i in range(len(data_keys))]
+
+    def open_source(data_key):
+        return s3.get_object(Bucket=export_bucket, Key=data_key)['Body']
+
+    with tempfile.TemporaryDirectory(prefix='dynamodb-export-', dir=os.getenv('EXPORT_TMP_DIR') or None) as spool_dir:
+        spool_files, profile = spool_parts(data_keys, spool_dir, transform, open_source=open_source,
+                                           retry_policy=retry_policy, max_workers=max_workers, stats=stats)
+
+        def publish(index):
+            local_file = f"{spool_files[index]}.{file_format}"
+            rows = write_part(spool_files[index], local_file, file_format, profile)
+            os.remove(spool_files[index])
+            with open(local_file, 'rb') as body:
+                def put_object():
+                    body.seek(0)
+                    s3.put_object(Bucket=output_bucket, Key=part_keys[index], Body=body)
+                retry_policy.call(put_object)
+            os.remove(local_file)
+            return rows
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(publish, i) for i in range(len(data_keys))]
+            rows = sum(future.result() for future in futures)
+
+    remove_stale_outputs(s3, output_bucket, output_prefix, part_keys)
+    logger.info(f"Exportación convertida: {len(data_keys)} archivos, {rows} filas en s3://{output_bucket}/{output_prefix}-part-*")
+    return rows
+
+
+def export_table_to_s3(session, table_name, bucket_name, output_prefix, transform, file_format='csv', stats=None):
+    """Obtiene una exportación de la tabla (reutilizando una reciente si EXPORT_MAX_AGE_HOURS lo permite) y la convierte."""
+    max_age_hours = float(os.getenv('EXPORT_MAX_AGE_HOURS', '0'))
+    export_arn = find_latest_export(session, table_name, max_age_hours) if max_age_hours > 0 else None
+    if export_arn:
+        logger.info(f"Reutilizando la exportación existente {export_arn}")
+    else:
+        export_bucket = os.getenv('EXPORT_S3_BUCKET', bucket_name)
+        export_arn = start_table_export(session, table_name, export_bucket, f"dynamodb-exports/{table_name}")
+    description = wait_for_export(session, export_arn)
+    return convert_s3_export(session, description, bucket_name, output_prefix, transform, file_format, stats=stats)
@@ -1,4 +1,3 @@
-import boto3
 import pandas as pd
 import json
 import os
@@ -6,21 +5,17 @@ import logging
 from botocore.exceptions import ClientError, NoCredentialsError
 from dotenv import load_dotenv
 import mysql.connector
+import mysql.connector.pooling
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from aws_session import get_shared_session
+from log_config import ProgressLogger, setup_logging
+from aws_retry import CLIENT_CONFIG, CircuitOpenError, get_retry_policy, log_retry_metrics
+from query_backends import QueryBackendError, run_athena_query, run_duckdb_query, source_exists
 
-# Configurar el logging
+# Configurar el logging (escritura en segundo plano)
 log_directory = "/home/ubuntu/logs"
-if not os.path.exists(log_directory):
-    os.makedirs(log_directory)
-
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s.%(msecs)03d %(levelname)s %(name)s %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S',
-    handlers=[
-        logging.FileHandler(f"{log_directory}/etl_service.log"),
-        logging.StreamHandler()
-    ]
-)
+setup_logging(f"{log_directory}/etl_service.log")
 
 logger = logging.getLogger(__name__)
 
@@ -30,42 +25,365 @@ load_dotenv()
 def create_boto3_session():
     """Crea una sesión de boto3 usando las credenciales especificadas en el archivo de configuración."""
     try:
-        session = boto3.Session(region_name=os.getenv('AWS_REGION', 'us-east-1'))
+        # Sesión compartida: reutiliza los clientes si el proceso ejecuta varios trabajos
+        session = get_shared_session()
         return session
     except (ClientError, NoCredentialsError) as e:
         logger.error(f"Error al crear la sesión de boto3: {e}")
         raise
 
-def save_to_mysql(df, table_name):
-    """Guarda un DataFrame en una tabla MySQL."""
-    try:
-        conn = mysql.connector.connect(
-            host=os.getenv('MYSQL_HOST'),
-            user=os.getenv('MYSQL_USER'),
-            password=os.getenv('MYSQL_PASSWORD'),
-            database=os.getenv('MYSQL_DATABASE')
+_key_columns_cache = {}
+
+def get_dynamodb_key_columns(session, table_name):
+    """Obtiene los atributos de la clave primaria de una tabla DynamoDB (HASH y luego RANGE)."""
+    if table_name not in _key_columns_cache:
+        dynamodb = session.client('dynamodb', config=CLIENT_CONFIG)
+        response = get_retry_policy('dynamodb').call(dynamodb.describe_table, TableName=table_name)
+        key_schema = sorted(response['Table']['KeySchema'], key=lambda k: k['KeyType'] != 'HASH')
+        _key_columns_cache[table_name] = [k['AttributeName'] for k in key_schema]
+    return _key_columns_cache[table_name]
+
+def mysql_connection_params():
+    """Parámetros de conexión a MySQL tomados de las variables de entorno."""
+    return {
+        'host': os.getenv('MYSQL_HOST'),
+        'user': os.getenv('MYSQL_USER'),
+        'password': os.getenv('MYSQL_PASSWORD'),
+        'database': os.getenv('MYSQL_DATABASE')
+    }
+
+def create_mysql_pool(pool_size=None):
+    """Crea un pool de conexiones MySQL reutilizable entre cargas."""
+    pool_size = pool_size or int(os.getenv('MYSQL_POOL_SIZE', '5'))
+    return mysql.connector.pooling.MySQLConnectionPool(
+        pool_name='etl_pool',
+        pool_size=pool_size,
+        **mysql_connection_params()
+    )
+
+_mysql_pool = None
+
+def get_mysql_pool():
+    """Devuelve el pool de conexiones del proceso, creándolo la primera vez."""
+    global _mysql_pool
+    if _mysql_pool is None:
+        _mysql_pool = create_mysql_pool()
+    return _mysql_pool
+
+def get_mysql_connection(pool=None, timeout=None, poll_interval=0.1):
+    """Obtiene una conexión del pool o abre una nueva si no hay pool.
+
+    MySQLConnectionPool falla al instante cuando no quedan conexiones libres;
+    aquí se espera hasta `timeout` segundos (MYSQL_POOL_TIMEOUT) a que otra
+    carga devuelva la suya, ya que el pool lo comparten las cargas del ETL, los
+    sinks de ingesta y las estadísticas.
+    """
+    if pool is None:
+        return mysql.connector.connect(**mysql_connection_params())
+    if timeout is None:
+        timeout = float(os.getenv('MYSQL_POOL_TIMEOUT', '300'))
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return pool.get_connection()
+        except mysql.connector.errors.PoolError:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(poll_interval)
+
+def begin_bulk_load(conn, cursor):
+    """Ajusta la sesión para cargas masivas: sin autocommit ni comprobaciones de unicidad/FK."""
+    conn.autocommit = False
+    cursor.execute('SET SESSION unique_checks = 0')
+    cursor.execute('SET SESSION foreign_key_checks = 0')
+
+def end_bulk_load(cursor):
+    """Restaura la sesión antes de devolver la conexión al pool."""
+    cursor.execute('SET SESSION unique_checks = 1')
+    cursor.execute('SET SESSION foreign_key_checks = 1')
+
+def dataframe_rows(df):
+    """Convierte las filas de un DataFrame en tuplas de texto (NaN como NULL)."""
+    return [
+        tuple(None if pd.isna(val) else str(val) for val in row)
+        for row in df.itertuples(index=False, name=None)
+    ]
+
+# Límites de DynamoDB: 2048 bytes para la clave de partición y 1024 para la de
+# ordenación. VARBINARY compara byte a byte, igual que DynamoDB, y ambas caben
+# en el máximo de 3072 bytes de un índice InnoDB.
+KEY_COLUMN_TYPES = ['VARBINARY(2048)', 'VARBINARY(1024)']
+
+def key_column_type(key_columns, col):
+    """Tipo de una columna clave según su posición (HASH y luego RANGE)."""
+    return KEY_COLUMN_TYPES[min(key_columns.index(col), len(KEY_COLUMN_TYPES) - 1)]
+
+def column_definitions(columns, key_columns, with_primary_key=True):
+    """Construye las definiciones de columnas; las claves usan VARBINARY para poder indexarlas."""
+    definitions = [
+        f'`{col}` {key_column_type(key_columns, col)} NOT NULL' if col in key_columns else f'`{col}` TEXT'
+        for col in columns
+    ]
+    if key_columns and with_primary_key:
+        keys = ', '.join([f'`{col}`' for col in key_columns])
+        definitions.append(f'PRIMARY KEY ({keys})')
+    return ', '.join(definitions)
+
+def insert_statement(table_name, columns):
+    column_list = ', '.join([f'`{col}`' for col in columns])
+    placeholders = ', '.join(['%s'] * len(columns))
+    return f'INSERT INTO `{table_name}` ({column_list}) VALUES ({placeholders})'
+
+def bulk_insert(cursor, table_name, columns, batches, batch_size=1000):
+    """Inserta lotes de filas usando executemany con parámetros. Devuelve el total de filas.
+
+    `columns` puede crecer mientras se leen los lotes (sinks en streaming): las
+    filas de cada lote siguen las columnas vigentes al recibirlo y las nuevas
+    se añaden a la tabla antes de insertarlo.
+    """
+    inserted_columns = list(columns)
+    insert_query = insert_statement(table_name, inserted_columns)
+    # Con lotes de 1000 filas se registra el detalle de uno de cada 100 lotes
+    progress = ProgressLogger(logger, f"Inserción en {table_name}", sample_every=100)
+    number = 0
+    for rows in batches:
+        if len(columns) > len(inserted_columns):
+            for col in columns[len(inserted_columns):]:
+                logger.info(f"Añadiendo columna {col} a la tabla {table_name}.")
+                cursor.execute(f'ALTER TABLE `{table_name}` ADD COLUMN `{col}` TEXT')
+            inserted_columns = list(columns)
+            insert_query = insert_statement(table_name, inserted_columns)
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            cursor.executemany(insert_query, batch)
+            number += 1
+            progress.update(len(batch), detail=f"lote {number}: filas {progress.count + 1}-{progress.count + len(batch)}")
+    progress.done()
+    return progress.count
+
+def add_primary_key(cursor, table_name, key_columns):
+    """Construye la clave primaria una vez cargados los datos (índice diferido)."""
+    keys = ', '.join([f'`{col}`' for col in key_columns])
+    cursor.execute(f'ALTER TABLE `{table_name}` ADD PRIMARY KEY ({keys})')
+
+def ensure_primary_key(cursor, table_name, key_columns):
+    """Recrea con clave primaria una tabla cargada en modo append, eliminando los duplicados.
+
+    Entre filas con la misma clave se conserva la última leída; el merge
+    posterior la actualiza con los datos del origen.
+    """
+    cursor.execute(f"SHOW KEYS FROM `{table_name}` WHERE Key_name = 'PRIMARY'")
+    if cursor.fetchall():
+        return
+    logger.warning(f"La tabla {table_name} no tiene clave primaria; se recrea eliminando duplicados.")
+    dedup_table = f'{table_name}_dedup'
+    old_table = f'{table_name}_old'
+    cursor.execute(f'DROP TABLE IF EXISTS `{dedup_table}`')
+    cursor.execute(f'DROP TABLE IF EXISTS `{old_table}`')
+    cursor.execute(f'CREATE TABLE `{dedup_table}` LIKE `{table_name}`')
+    for col in key_columns:
+        cursor.execute(f'ALTER TABLE `{dedup_table}` MODIFY COLUMN `{col}` {key_column_type(key_columns, col)} NOT NULL')
+    add_primary_key(cursor, dedup_table, key_columns)
+
+    cursor.execute(f'SHOW COLUMNS FROM `{table_name}`')
+    existing = [row[0] for row in cursor.fetchall()]
+    column_list = ', '.join([f'`{col}`' for col in existing])
+    not_null = ' AND '.join([f'`{col}` IS NOT NULL' for col in key_columns])
+    updates = ', '.join([f'`{col}` = VALUES(`{col}`)' for col in existing])
+    cursor.execute(
+        f'INSERT INTO `{dedup_table}` ({column_list}) SELECT {column_list} FROM `{table_name}` '
+        f'WHERE {not_null} ON DUPLICATE KEY UPDATE {updates}'
+    )
+    cursor.execute(f'RENAME TABLE `{table_name}` TO `{old_table}`, `{dedup_table}` TO `{table_name}`')
+    cursor.execute(f'DROP TABLE IF EXISTS `{old_table}`')
+
+def ensure_columns(cursor, table_name, columns):
+    """Añade a la tabla las columnas nuevas que aparecieron en el origen."""
+    cursor.execute(f'SHOW COLUMNS FROM `{table_name}`')
+    existing = {row[0] for row in cursor.fetchall()}
+    for col in columns:
+        if col not in existing:
+            logger.info(f"Añadiendo columna {col} a la tabla {table_name}.")
+            cursor.execute(f'ALTER TABLE `{table_name}` ADD COLUMN `{col}` TEXT')
+
+def append_to_table(cursor, table_name, columns, batches):
+    """Inserta las filas en la tabla, creándola si no existe."""
+    cursor.execute(f'CREATE TABLE IF NOT EXISTS `{table_name}` ({column_definitions(columns, [])})')
+    ensure_columns(cursor, table_name, columns)
+    return bulk_insert(cursor, table_name, columns, batches)
+
+def merge_into_table(cursor, table_name, columns, batches, key_columns, delete_missing=False):
+    """Carga en una tabla staging y aplica INSERT ... ON DUPLICATE KEY UPDATE sobre la tabla final."""
+    staging_table = f'{table_name}_staging'
+    cursor.execute(f'CREATE TABLE IF NOT EXISTS `{table_name}` ({column_definitions(columns, key_columns)})')
+    ensure_columns(cursor, table_name, columns)
+    ensure_primary_key(cursor, table_name, key_columns)
+
+    cursor.execute(f'DROP TABLE IF EXISTS `{staging_table}`')
+    cursor.execute(f'CREATE TABLE `{staging_table}` ({column_definitions(columns, key_columns, with_primary_key=False)})')
+    known_columns = len(columns)
+    total_rows = bulk_insert(cursor, staging_table, columns, batches)
+    add_primary_key(cursor, staging_table, key_columns)
+    if len(columns) > known_columns:
+        # Columnas que aparecieron durante la carga en streaming
+        ensure_columns(cursor, table_name, columns)
+
+    column_list = ', '.join([f'`{col}`' for col in columns])
+    update_columns = [col for col in columns if col not in key_columns] or key_columns
+    updates = ', '.join([f'`{col}` = VALUES(`{col}`)' for col in update_columns])
+    cursor.execute(
+        f'INSERT INTO `{table_name}` ({column_list}) SELECT {column_list} FROM `{staging_table}` '
+        f'ON DUPLICATE KEY UPDATE {updates}'
+    )
+    logger.info(f"Merge aplicado en {table_name}: {cursor.rowcount} filas afectadas.")
+
+    if delete_missing and total_rows == 0:
+        # Un origen vacío (consulta sin filas, crawler o exportación fallidos) no debe vaciar la tabla
+        logger.warning(f"El origen de {table_name} no devolvió filas; no se eliminan filas ausentes.")
+    elif delete_missing:
+        join_condition = ' AND '.join([f't.`{col}` = s.`{col}`' for col in key_columns])
+        cursor.execute(
+            f'DELETE t FROM `{table_name}` t LEFT JOIN `{staging_table}` s ON {join_condition} '
+            f'WHERE s.`{key_columns[0]}` IS NULL'
         )
+        logger.info(f"Filas eliminadas de {table_name} por no existir en el origen: {cursor.rowcount}.")
+
+    cursor.execute(f'DROP TABLE IF EXISTS `{staging_table}`')
+    return total_rows
+
+def swap_table(cursor, table_name, columns, batches, key_columns):
+    """Carga una tabla nueva y la intercambia con la actual mediante RENAME TABLE atómico."""
+    new_table = f'{table_name}_new'
+    old_table = f'{table_name}_old'
+    cursor.execute(f'DROP TABLE IF EXISTS `{new_table}`')
+    cursor.execute(f'DROP TABLE IF EXISTS `{old_table}`')
+    cursor.execute(f'CREATE TABLE `{new_table}` ({column_definitions(columns, key_columns, with_primary_key=False)})')
+    total_rows = bulk_insert(cursor, new_table, columns, batches)
+    add_primary_key(cursor, new_table, key_columns)
+
+    cursor.execute(f'CREATE TABLE IF NOT EXISTS `{table_name}` LIKE `{new_table}`')
+    cursor.execute(f'RENAME TABLE `{table_name}` TO `{old_table}`, `{new_table}` TO `{table_name}`')
+    cursor.execute(f'DROP TABLE IF EXISTS `{old_table}`')
+    logger.info(f"Tabla {table_name} reemplazada con {total_rows} filas.")
+    return total_rows
+
+def load_rows_to_mysql(columns, batches, table_name, key_columns=None, mode=None, delete_missing=None, pool=None):
+    """Carga en MySQL filas que llegan por lotes (iterador de listas de tuplas).
+
+    Modos (MYSQL_LOAD_MODE): 'append' inserta las filas sin más, 'merge' actualiza
+    por clave primaria y 'swap' reemplaza la tabla completa. 'merge' y 'swap'
+    requieren `key_columns` (ver get_dynamodb_key_columns). Si se indica `pool`
+    la conexión se toma de él. Si `columns` es una lista puede crecer mientras
+    se leen los lotes (ver bulk_insert). Devuelve las filas cargadas y el tiempo
+    empleado.
+    """
+    mode = mode or os.getenv('MYSQL_LOAD_MODE', 'append')
+    if delete_missing is None:
+        delete_missing = os.getenv('MYSQL_DELETE_MISSING', 'false').lower() == 'true'
+    key_columns = key_columns or []
+    if not isinstance(columns, list):
+        columns = list(columns)
+
+    if mode in ('merge', 'swap'):
+        missing_keys = [col for col in key_columns if col not in columns]
+        if not key_columns or missing_keys:
+            logger.error(f"El modo {mode} requiere las columnas clave {key_columns} en los datos de {table_name}.")
+            return None
+
+    conn = None
+    try:
+        start_time = time.monotonic()
+        conn = get_mysql_connection(pool)
         cursor = conn.cursor()
-        
-        # Crear la tabla si no existe
-        columns = ', '.join([f'`{col}` TEXT' for col in df.columns])
-        create_table_query = f'CREATE TABLE IF NOT EXISTS `{table_name}` ({columns})'
-        logger.info(f"Creando tabla con la consulta: {create_table_query}")
-        cursor.execute(create_table_query)
-        
-        # Insertar los datos
-        for _, row in df.iterrows():
-            values = ', '.join([f"'{val}'" for val in row])
-            insert_query = f'INSERT INTO `{table_name}` VALUES ({values})'
-            logger.info(f"Insertando datos con la consulta: {insert_query}")
-            cursor.execute(insert_query)
-        
+        begin_bulk_load(conn, cursor)
+
+        if mode == 'merge':
+            total_rows = merge_into_table(cursor, table_name, columns, batches, key_columns, delete_missing)
+        elif mode == 'swap':
+            total_rows = swap_table(cursor, table_name, columns, batches, key_columns)
+        else:
+            total_rows = append_to_table(cursor, table_name, columns, batches)
+
         conn.commit()
+        end_bulk_load(cursor)
         cursor.close()
-        conn.close()
-        logger.info(f"Datos guardados en MySQL, tabla: {table_name}.")
-    except mysql.connector.Error as err:
+        elapsed = time.monotonic() - start_time
+        rows_per_second = total_rows / elapsed if elapsed > 0 else 0.0
+        logger.info(
+            f"Datos guardados en MySQL, tabla: {table_name}. "
+            f"{total_rows} filas en {elapsed:.2f}s ({rows_per_second:.0f} filas/s)."
+        )
+        return {'table': table_name, 'rows': total_rows, 'seconds': elapsed}
+    except (mysql.connector.Error, QueryBackendError) as err:
+        # Los lotes se leen durante la carga: un error del motor de consulta también la aborta
         logger.error(f"Error al guardar datos en MySQL: {err}")
+        if conn is not None:
+            conn.rollback()
+        return None
+    except Exception:
+        # Carga abortada por quien produce los lotes (p. ej. un sink desconectado)
+        if conn is not None:
+            conn.rollback()
+        raise
+    finally:
+        # Con pool, close() devuelve la conexión en lugar de cerrarla
+        if conn is not None:
+            conn.close()
+
+def save_to_mysql(df, table_name, key_columns=None, mode=None, delete_missing=None, pool=None):
+    """Guarda un DataFrame en una tabla MySQL (ver load_rows_to_mysql)."""
+    return load_rows_to_mysql(
+        df.columns, [dataframe_rows(df)], table_name,
+        key_columns=key_columns, mode=mode, delete_missing=delete_missing, pool=pool
+    )
+
+def run_summary_job(table_name, query, view, source, database, backend=None, athena_client=None,
+                    output_location=None, key_columns=None, pool=None):
+    """Ejecuta la consulta de resumen con el motor indicado y carga el resultado en MySQL.
+
+    Motores: 'athena' consulta la base de datos Glue; 'duckdb' lee directamente
+    el archivo exportado (`source`, ruta local o s3://) registrado como `view`.
+    """
+    backend = backend or os.getenv('QUERY_BACKEND', 'athena')
+    logger.info(f"Ejecutando consulta de resumen para {table_name} con {backend}...")
+    try:
+        if backend == 'duckdb':
+            columns, batches = run_duckdb_query(query, {view: source})
+        else:
+            columns, batches = run_athena_query(athena_client, query, database, output_location)
+    except (ClientError, CircuitOpenError, QueryBackendError, RuntimeError, TimeoutError) as e:
+        logger.error(f"Error al ejecutar la consulta de resumen para {table_name}: {e}")
+        return None
+    return load_rows_to_mysql(columns, batches, table_name, key_columns=key_columns, pool=pool)
+
+def load_tables_parallel(jobs, pool=None, max_workers=None, loader=save_to_mysql):
+    """Carga varias tablas en paralelo, cada una con su propia conexión del pool.
+
+    `jobs` es una lista de diccionarios con los argumentos de `loader`
+    (por defecto save_to_mysql: df, table_name y opcionalmente key_columns,
+    mode, delete_missing).
+    """
+    pool = pool or get_mysql_pool()
+    max_workers = max_workers or pool.pool_size
+    results = []
+    start_time = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(loader, pool=pool, **job): job['table_name'] for job in jobs}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                # Una tabla fallida no debe detener la carga de las demás
+                logger.exception(f"Error inesperado al cargar la tabla {futures[future]}: {e}")
+                result = None
+            if result is None:
+                logger.error(f"La carga de la tabla {futures[future]} falló.")
+            else:
+                results.append(result)
+    elapsed = time.monotonic() - start_time
+    total_rows = sum(r['rows'] for r in results)
+    logger.info(f"Cargadas {len(results)}/{len(jobs)} tablas, {total_rows} filas en {elapsed:.2f}s.")
+    return results
 
 def main():
     logger.info("Iniciando sesión de boto3...")
@@ -73,6 +391,8 @@ def main():
     glue_client = session.client('glue')
     s3_bucket = os.getenv('S3_BUCKET_PROD')
     output_location = f"s3://{s3_bucket}/athena-results/"
+    local_data_dir = os.getenv('LOCAL_DATA_DIR')
+    load_mode = os.getenv('MYSQL_LOAD_MODE', 'append')
     
     # Construir la lista de bases de datos Glue utilizando las variables de entorno
     glue_databases = [
@@ -91,5 +411,47 @@ def main():
         f"crawler_ingest-service-5_{os.getenv('DYNAMODB_TABLE_5_PROD')}_prod"
     ]
 
+    athena_client = session.client('athena', config=CLIENT_CONFIG)
+    s3_client = session.client('s3', config=CLIENT_CONFIG)
+    jobs = []
+    for i, glue_database in enumerate(glue_databases, start=1):
+        dynamodb_table = os.getenv(f'DYNAMODB_TABLE_{i}_PROD')
+        ingest_type = f'ingest-service-{i}'
+        # El crawler nombra la tabla según la carpeta; la vista DuckDB usa el mismo nombre
+        view = ingest_type.replace('-', '_')
+        # Archivo del scan o partes de una exportación (cada publicación borra las salidas del otro modo)
+        file_path = f'{ingest_type}/{dynamodb_table}*.csv'
+        source = os.path.join(local_data_dir, file_path) if local_data_dir else f's3://{s3_bucket}/{file_path}'
+        backend = os.getenv(f'QUERY_BACKEND_{i}') or os.getenv('QUERY_BACKEND', 'athena')
+        if backend == 'duckdb':
+            # Algunos servicios no publican en S3 (p. ej. ingest-service-3 solo escribe en local)
+            try:
+                if not source_exists(source, s3_client):
+                    logger.warning(f"No hay archivos en {source}; se omite la tabla summary_table_ingest_service_{i}.")
+                    continue
+            except (ClientError, CircuitOpenError) as e:
+                logger.error(f"Error al comprobar el origen {source}: {e}")
+                continue
+        job = {
+            'table_name': f'summary_table_ingest_service_{i}',
+            'query': os.getenv(f'SUMMARY_QUERY_{i}', f'SELECT * FROM "{view}"'),
+            'view': view,
+            'source': source,
+            'database': glue_database,
+            'backend': backend,
+            'athena_client': athena_client,
+            'output_location': output_location,
+        }
+        if load_mode in ('merge', 'swap'):
+            try:
+                job['key_columns'] = get_dynamodb_key_columns(session, dynamodb_table)
+            except ClientError as e:
+                logger.error(f"Error al obtener la clave primaria de {dynamodb_table}: {e}")
+                continue
+        jobs.append(job)
+
+    load_tables_parallel(jobs, loader=run_summary_job)
+    log_retry_metrics()
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,199 @@
+import logging
+import os
+import time
+from botocore.exceptions import ClientError
+from aws_retry import CLIENT_CONFIG, CircuitOpenError, get_retry_policy, log_retry_metrics
+from aws_session import invalidate_shared_session
+from column_stats import save_stats_to_mysql, stats_to_json
+from dynamodb_export import export_table_to_s3
+from normalize import export_normalized, normalizer_from_env
+from scan_cache import scan_cache_from_env
+from sinks import create_sinks, fan_out, transform_pages
+
+logger = logging.getLogger(__name__)
+
+# Flujo común de los servicios de ingesta 1, 2, 4 y 5: exportación o scan
+# hacia los sinks, normalización, estadísticas y crawler de Glue. Cada
+# servicio solo aporta su tabla y su transform_items.
+
+def scan_dynamodb_pages(session, table_name, cache=None):
+    """Recorre las páginas de un scan de DynamoDB, opcionalmente a través de la caché local."""
+    dynamodb = session.client('dynamodb', config=CLIENT_CONFIG)
+    retry_policy = get_retry_policy('dynamodb')
+    scan_kwargs = {'TableName': table_name}
+
+    def scan_pages():
+        while True:
+            # Cada página se reintenta por separado para no repetir el scan completo
+            page = retry_policy.call(dynamodb.scan, **scan_kwargs)
+            yield page['Items']
+            if 'LastEvaluatedKey' not in page:
+                break
+            scan_kwargs['ExclusiveStartKey'] = page['LastEvaluatedKey']
+    
+    if cache is not None:
+        return cache.cached_pages(table_name, dict(scan_kwargs), scan_pages())
+    return scan_pages()
+
+def save_to_s3(session, data, bucket_name, file_name):
+    """Guarda los datos en un bucket S3."""
+    s3 = session.client('s3', config=CLIENT_CONFIG)
+
+    def put_object():
+        # Rebobinar el buffer en cada intento
+        if hasattr(data, 'seek'):
+            data.seek(0)
+        s3.put_object(Bucket=bucket_name, Key=file_name, Body=data)
+
+    get_retry_policy('s3').call(put_object)
+
+def create_glue_crawler(session, crawler_name, s3_target, role, database_name):
+    """Crea un crawler de AWS Glue."""
+    glue = session.client('glue', config=CLIENT_CONFIG)
+    try:
+        get_retry_policy('glue').call(
+            glue.create_crawler,
+            Name=crawler_name,
+            Role=role,
+            DatabaseName=database_name,
+            Targets={'S3Targets': [{'Path': s3_target}]},
+            SchemaChangePolicy={
+                'UpdateBehavior': 'UPDATE_IN_DATABASE',
+                'DeleteBehavior': 'DEPRECATE_IN_DATABASE'
+            }
+        )
+        logger.info(f"Crawler {crawler_name} creado exitosamente.")
+    except glue.exceptions.AlreadyExistsException:
+        logger.warning(f"Crawler {crawler_name} ya existe.")
+
+def start_glue_crawler(session, crawler_name):
+    """Inicia un crawler de AWS Glue."""
+    glue = session.client('glue', config=CLIENT_CONFIG)
+    try:
+        get_retry_policy('glue').call(glue.start_crawler, Name=crawler_name)
+        logger.info(f"Crawler {crawler_name} iniciado.")
+    except glue.exceptions.CrawlerRunningException:
+        logger.warning(f"Crawler {crawler_name} ya está en ejecución.")
+    except glue.exceptions.CrawlerNotFoundException:
+        logger.error(f"Crawler {crawler_name} no encontrado.")
+    except Exception as e:
+        logger.error(f"Error al iniciar el crawler {crawler_name}: {e}")
+
+def wait_for_crawler(glue_client, crawler_name, retries=20, delay=60):
+    """Espera a que el crawler de AWS Glue complete su ejecución."""
+    for _ in range(retries):
+        try:
+            response = get_retry_policy('glue').call(glue_client.get_crawler, Name=crawler_name)
+            state = response['Crawler']['State']
+            logger.info(f"Estado del crawler {crawler_name}: {state}")
+            if state == 'READY':
+                return True
+        except Exception as e:
+            logger.error(f"Error al obtener el estado del crawler {crawler_name}: {e}")
+        time.sleep(delay)
+    raise Exception(f"El crawler {crawler_name} no completó su ejecución después de varios intentos.")
+
+def run_ingest(session, ingest_type, table_name, bucket_name, transform, file_format='csv', role=None, stats=None):
+    """Ingesta la tabla DynamoDB `table_name` con `transform` y actualiza el catálogo de Glue.
+
+    INGEST_MODE=export convierte la exportación nativa; si no, una sola pasada
+    del scan alimenta los sinks de INGEST_SINKS. `stats` (TableStats) se
+    guarda en `{ingest_type}-stats/` y opcionalmente en MySQL.
+    """
+    glue_database = f"glue_database_{ingest_type}_{table_name}_prod"
+    glue_crawler_name = f"crawler_{ingest_type}_{table_name}_prod"
+    upload_to_s3 = True
+    normalizer = None
+    
+    if os.getenv('INGEST_MODE', 'scan') == 'export':
+        # Convertir la exportación nativa de DynamoDB en lugar de escanear la tabla
+        try:
+            logger.info(f"Convirtiendo la exportación de la tabla DynamoDB: {table_name}...")
+            export_table_to_s3(session, table_name, bucket_name, f'{ingest_type}/{table_name}', transform, file_format, stats=stats)
+        except (ClientError, CircuitOpenError, RuntimeError, TimeoutError) as e:
+            logger.error(f"Error al convertir la exportación de DynamoDB: {e}")
+            return
+    else:
+        # Una sola pasada del scan alimenta todos los destinos (INGEST_SINKS: s3, mysql, local)
+        sink_names = os.getenv('INGEST_SINKS', 's3')
+        try:
+            sinks = create_sinks(sink_names, session, bucket_name, ingest_type, table_name, file_format)
+        except Exception as e:
+            logger.error(f"Error al preparar los destinos {sink_names}: {e}")
+            return
+
+        try:
+            logger.info(f"Escaneando y transformando la tabla DynamoDB: {table_name} hacia {sink_names}...")
+            pages = scan_dynamodb_pages(session, table_name, cache=scan_cache_from_env())
+            # Normalización opcional de listas y mapas en tablas hijas, en la misma pasada
+            normalizer = normalizer_from_env(session, table_name)
+            if normalizer is not None:
+                pages = normalizer.observe(pages)
+            results = fan_out(transform_pages(pages, transform, stats, label=f"Scan de {table_name}"), sinks)
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ExpiredTokenException':
+                logger.error("El token de seguridad ha expirado. Por favor, renueva las credenciales de AWS.")
+                # El siguiente trabajo del scheduler vuelve a leer las credenciales
+                invalidate_shared_session()
+                return
+            else:
+                logger.error(f"Error al escanear la tabla DynamoDB: {e}")
+                return
+        except CircuitOpenError as e:
+            logger.error(f"Error al escanear la tabla DynamoDB: {e}")
+            return
+    
+        upload_to_s3 = 's3' in results
+        failed_sinks = [name for name, result in results.items() if result['error']]
+        if failed_sinks:
+            logger.error(f"Destinos con error: {', '.join(failed_sinks)}")
+        if 's3' in failed_sinks:
+            return
+    
+        for sink in sinks:
+            if sink.name == 's3':
+                logger.info(f"Ingesta de datos completada. Archivo subido a S3: {sink.file_name}")
+                logger.info(f"Ruta completa del archivo CSV: s3://{bucket_name}/{sink.file_name}")
+
+        if normalizer is not None:
+            try:
+                export_normalized(normalizer, session, bucket_name, ingest_type, to_mysql='mysql' in results and 'mysql' not in failed_sinks)
+            except Exception as e:
+                logger.error(f"Error al exportar las tablas normalizadas: {e}")
+                normalizer = None
+
+    if stats is not None:
+        # Fuera de la carpeta del crawler para no mezclarse con los datos
+        stats_file_name = f'{ingest_type}-stats/{table_name}.stats.json'
+        save_to_s3(session, stats_to_json(stats), bucket_name, stats_file_name)
+        logger.info(f"Estadísticas por columna guardadas en s3://{bucket_name}/{stats_file_name}")
+        if os.getenv('STATS_TO_MYSQL', 'false').lower() == 'true':
+            save_stats_to_mysql(stats, table_name)
+
+    if not upload_to_s3:
+        # Sin archivo nuevo en S3 no tiene sentido lanzar el crawler
+        log_retry_metrics()
+        return
+    
+    # Crear y ejecutar el crawler de AWS Glue
+    s3_target = f"s3://{bucket_name}/{ingest_type}/"  # Apuntar a la carpeta específica
+    create_glue_crawler(session, glue_crawler_name, s3_target, role, glue_database)
+    start_glue_crawler(session, glue_crawler_name)
+    if normalizer is not None:
+        # Un crawler aparte crea una tabla por cada carpeta normalizada
+        normalized_crawler_name = f"{glue_crawler_name}_normalized"
+        create_glue_crawler(session, normalized_crawler_name, f"s3://{bucket_name}/{ingest_type}-normalized/", role, glue_database)
+        start_glue_crawler(session, normalized_crawler_name)
+    
+    # Esperar a que el crawler complete su ejecución
+    glue_client = session.client('glue', config=CLIENT_CONFIG)
+    wait_for_crawler(glue_client, glue_crawler_name)
+
+    # Eliminar la tabla existente para forzar la reconstrucción del esquema
+    try:
+        get_retry_policy('glue').call(glue_client.delete_table, DatabaseName=glue_database, Name=f"{ingest_type}_{table_name}_csv")
+        logger.info(f"Tabla {ingest_type}_{table_name}_csv eliminada para forzar la reconstrucción del esquema.")
+    except glue_client.exceptions.EntityNotFoundException:
+        logger.info(f"La tabla {ingest_type}_{table_name}_csv no existe, no es necesario eliminarla.")
+
+    log_retry_metrics()
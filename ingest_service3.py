@@ -1,25 +1,18 @@
-import boto3
-import pandas as pd
 import json
 import os
 import logging
 from botocore.exceptions import ClientError, NoCredentialsError
 from dotenv import load_dotenv
+from aws_session import get_shared_session
+from log_config import ProgressLogger, setup_logging
+from csv_writer import save_csv_file
+from column_stats import save_stats_to_mysql, stats_from_env, stats_to_json
+from scan_cache import scan_cache_from_env
+from aws_retry import CLIENT_CONFIG, get_retry_policy, log_retry_metrics
 
-# Configurar el logging
+# Configurar el logging (escritura en segundo plano)
 log_directory = "/home/ubuntu/logs"
-if not os.path.exists(log_directory):
-    os.makedirs(log_directory)
-
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s.%(msecs)03d %(levelname)s %(name)s %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S',
-    handlers=[
-        logging.FileHandler(f"{log_directory}/ingest_service3.log"),
-        logging.StreamHandler()
-    ]
-)
+setup_logging(f"{log_directory}/ingest_service3.log")
 
 logger = logging.getLogger(__name__)
 
@@ -29,21 +22,39 @@ load_dotenv()
 def create_boto3_session():
     """Crea una sesión de boto3 usando las credenciales especificadas en el archivo de configuración."""
     try:
-        session = boto3.Session(region_name=os.getenv('AWS_REGION', 'us-east-1'))
+        # Sesión compartida: reutiliza los clientes si el proceso ejecuta varios trabajos
+        session = get_shared_session()
         return session
     except (ClientError, NoCredentialsError) as e:
         logger.error(f"Error al crear la sesión de boto3: {e}")
         raise
 
-def scan_dynamodb_table(session, table_name):
-    """Realiza un scan de una tabla DynamoDB con paginación."""
-    dynamodb = session.client('dynamodb')
-    paginator = dynamodb.get_paginator('scan')
-    response_iterator = paginator.paginate(TableName=table_name)
+def scan_dynamodb_table(session, table_name, cache=None):
+    """Realiza un scan de una tabla DynamoDB con paginación, opcionalmente a través de la caché local."""
+    dynamodb = session.client('dynamodb', config=CLIENT_CONFIG)
+    retry_policy = get_retry_policy('dynamodb')
+    scan_kwargs = {'TableName': table_name}
+
+    def scan_pages():
+        while True:
+            # Cada página se reintenta por separado para no repetir el scan completo
+            page = retry_policy.call(dynamodb.scan, **scan_kwargs)
+            yield page['Items']
+            if 'LastEvaluatedKey' not in page:
+                break
+            scan_kwargs['ExclusiveStartKey'] = page['LastEvaluatedKey']
+    
+    if cache is not None:
+        pages = cache.cached_pages(table_name, dict(scan_kwargs), scan_pages())
+    else:
+        pages = scan_pages()
     
     items = []
-    for page in response_iterator:
-        items.extend(page['Items'])
+    progress = ProgressLogger(logger, f"Scan de {table_name}", sample_every=100)
+    for number, page in enumerate(pages, 1):
+        items.extend(page)
+        progress.update(len(page), detail=f"página {number}: {len(page)} elementos")
+    progress.done()
     
     return items
 
@@ -77,8 +88,7 @@ def process_dynamodb_items(items):
 
 def save_to_csv(data, file_name):
     """Guarda los datos en un archivo CSV."""
-    df = pd.DataFrame(data)
-    df.to_csv(file_name, index=False)
+    save_csv_file(data, file_name)
     logger.info(f"Archivo CSV guardado: {file_name}")
 
 def main():
@@ -92,14 +102,25 @@ def main():
     session = create_boto3_session()
     
     logger.info(f"Escaneando la tabla DynamoDB: {table_name}...")
-    items = scan_dynamodb_table(session, table_name)
+    items = scan_dynamodb_table(session, table_name, cache=scan_cache_from_env())
     
     logger.info("Procesando los elementos de DynamoDB...")
     processed_items = process_dynamodb_items(items)
+    stats = stats_from_env()
+    if stats is not None:
+        stats.update(processed_items)
     
     logger.info(f"Guardando los datos procesados en el archivo CSV: {output_file}...")
     save_to_csv(processed_items, output_file)
+
+    if stats is not None:
+        with open(f"{output_file}.stats.json", 'w', encoding='utf-8') as f:
+            f.write(stats_to_json(stats))
+        logger.info(f"Estadísticas por columna guardadas en {output_file}.stats.json")
+        if os.getenv('STATS_TO_MYSQL', 'false').lower() == 'true':
+            save_stats_to_mysql(stats, table_name)
     
+    log_retry_metrics()
     logger.info("Proceso completado con éxito.")
 
 if __name__ == "__main__":
@@ -0,0 +1,120 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+
+LOG_FORMAT = '%(asctime)s.%(msecs)03d %(levelname)s %(name)s %(message)s'
+LOG_DATEFMT = '%Y-%m-%d %H:%M:%S'
+
+
+class JsonFormatter(logging.Formatter):
+    """Formatea cada registro como una línea JSON (apta para lnav)."""
+
+    def format(self, record):
+        entry = {
+            'timestamp': f"{self.formatTime(record, LOG_DATEFMT)}.{int(record.msecs):03d}",
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'message': record.getMessage(),
+        }
+        fields = getattr(record, 'fields', None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+_listener = None
+
+
+def setup_logging(log_file, level=logging.INFO, json_output=None):
+    """Configura el logging con escritura en segundo plano.
+
+    El hilo que llama solo encola el registro (QueueHandler); un QueueListener
+    lo escribe en el archivo y en consola. Con LOG_FORMAT=json los registros
+    se escriben como JSON. Solo la primera llamada del proceso tiene efecto,
+    de modo que los servicios importados por el scheduler usan su log.
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+    if json_output is None:
+        json_output = os.getenv('LOG_FORMAT', 'text').lower() == 'json'
+    formatter = JsonFormatter() if json_output else logging.Formatter(LOG_FORMAT, datefmt=LOG_DATEFMT)
+
+    log_directory = os.path.dirname(log_file)
+    if log_directory:
+        os.makedirs(log_directory, exist_ok=True)
+
+    handlers = [logging.FileHandler(log_file), logging.StreamHandler()]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(level)
+
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    # Vaciar la cola antes de terminar el proceso
+    atexit.register(listener.stop)
+    _listener = listener
+    return listener
+
+
+class ProgressLogger:
+    """Agrega mensajes de rutas calientes en líneas de progreso periódicas.
+
+    En lugar de un registro por elemento, `update` acumula contadores y emite
+    una línea INFO como mucho cada `interval` segundos. Los detalles por
+    elemento se registran en DEBUG solo una de cada `sample_every` llamadas.
+    """
+
+    def __init__(self, logger, label, total=None, interval=5.0, sample_every=1000, clock=time.monotonic):
+        self.logger = logger
+        self.label = label
+        self.total = total
+        self.interval = interval
+        self.sample_every = sample_every
+        self.clock = clock
+        self.count = 0
+        self.calls = 0
+        self.start_time = clock()
+        self.last_report = self.start_time
+        self.lock = threading.Lock()
+
+    def update(self, n=1, detail=None):
+        with self.lock:
+            self.count += n
+            self.calls += 1
+            sampled = detail is not None and (self.calls - 1) % self.sample_every == 0
+            now = self.clock()
+            report = now - self.last_report >= self.interval
+            if report:
+                self.last_report = now
+        if sampled and self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(f"{self.label} (muestra 1/{self.sample_every}): {detail}")
+        if report:
+            self._report(now)
+
+    def done(self):
+        self._report(self.clock(), final=True)
+
+    def _report(self, now, final=False):
+        elapsed = now - self.start_time
+        rate = self.count / elapsed if elapsed > 0 else 0.0
+        progress = f"{self.count}/{self.total}" if self.total is not None else f"{self.count}"
+        state = "completado" if final else "en curso"
+        self.logger.info(
+            f"{self.label} {state}: {progress} en {elapsed:.2f}s ({rate:.0f}/s)",
+            extra={'fields': {'progress_label': self.label, 'count': self.count, 'elapsed': round(elapsed, 3)}}
+        )
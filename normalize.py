@@ -0,0 +1,136 @@
+import json
+import logging
+import os
+from sinks import MySQLSink, S3Sink
+
+logger = logging.getLogger(__name__)
+
+# Normalización opcional de atributos anidados: los mapas se aplanan en
+# columnas `padre_hijo` y las listas se separan en tablas hijas
+# `{tabla}__{atributo}` con la clave primaria del elemento raíz
+# (`parent_{clave}`) y la posición (`_pos`) de cada elemento. Las listas dentro
+# de los elementos (atributos de un mapa o listas de listas, como atributo
+# `value`) se vuelven tablas nietas, que añaden la posición del elemento padre
+# (`{atributo}_pos`). Un atributo de un elemento que coincide con una de esas
+# columnas clave se guarda como `attr_{atributo}`. Un mapa o una lista en el
+# nivel `d` (1 = atributo de primer nivel) solo se expande si d < max_depth; si
+# no, se guarda como JSON, igual que hoy.
+
+
+def decode_number(value):
+    return float(value) if any(c in value for c in '.eE') else int(value)
+
+
+def decode_value(typed_value):
+    """Convierte un valor tipado de DynamoDB ({'S': ...}, {'M': ...}, ...) a Python."""
+    data_type, data_value = next(iter(typed_value.items()))
+    if data_type == 'N':
+        return decode_number(data_value)
+    if data_type == 'NULL':
+        return None
+    if data_type == 'M':
+        return {key: decode_value(value) for key, value in data_value.items()}
+    if data_type == 'L':
+        return [decode_value(value) for value in data_value]
+    if data_type == 'NS':
+        return [decode_number(value) for value in data_value]
+    if data_type in ('SS', 'BS'):
+        return list(data_value)
+    return data_value
+
+
+class Normalizer:
+    """Acumula las filas de la tabla padre y de sus tablas hijas a partir de los elementos crudos."""
+
+    def __init__(self, table_name, key_columns, max_depth=3):
+        self.table_name = table_name
+        self.key_columns = key_columns
+        self.max_depth = max_depth
+        self.tables = {table_name: []}
+        # Clave primaria de cada tabla: la del elemento raíz más las posiciones de los elementos
+        self.table_keys = {table_name: list(key_columns)}
+
+    def add_items(self, items):
+        for item in items:
+            row = {}
+            parent_keys = {f'parent_{key}': decode_value(item[key]) for key in self.key_columns if key in item}
+            self._flatten_fields(item, '', 1, row, parent_keys, self.table_name)
+            self.tables[self.table_name].append(row)
+
+    def observe(self, pages):
+        """Deja pasar las páginas del scan normalizándolas por el camino."""
+        for page in pages:
+            self.add_items(page)
+            yield page
+
+    def _flatten_fields(self, fields, prefix, depth, row, parent_keys, table):
+        for key, typed_value in fields.items():
+            self._flatten(f'{prefix}{key}', typed_value, depth, row, parent_keys, table)
+
+    def _flatten(self, column, typed_value, depth, row, parent_keys, table):
+        data_type, data_value = next(iter(typed_value.items()))
+        if data_type == 'M':
+            if depth < self.max_depth:
+                self._flatten_fields(data_value, f'{column}_', depth + 1, row, parent_keys, table)
+            else:
+                row[column] = json.dumps(decode_value(typed_value), ensure_ascii=False)
+        elif data_type in ('L', 'SS', 'NS', 'BS'):
+            if depth < self.max_depth:
+                self._explode(column, data_type, data_value, depth, parent_keys, table)
+            else:
+                row[column] = json.dumps(decode_value(typed_value), ensure_ascii=False)
+        else:
+            row[column] = decode_value(typed_value)
+
+    def _explode(self, column, data_type, elements, depth, parent_keys, table):
+        child_table = f'{table}__{column}'
+        rows = self.tables.setdefault(child_table, [])
+        self.table_keys.setdefault(child_table, list(parent_keys) + ['_pos'])
+        for position, element in enumerate(elements):
+            child_row = dict(parent_keys)
+            child_row['_pos'] = position
+            # Las nietas llevan la posición del elemento padre como parte de la clave
+            child_keys = dict(parent_keys)
+            child_keys[f'{column}_pos'] = position
+            if data_type != 'L':
+                # Conjuntos: elementos sin tipo propio
+                child_row['value'] = decode_number(element) if data_type == 'NS' else element
+            elif 'M' in element:
+                # Los atributos del mapa son las columnas de la fila hija, sin pisar las claves
+                fields = {}
+                self._flatten_fields(element['M'], '', depth + 1, fields, child_keys, child_table)
+                for key, value in fields.items():
+                    child_row[f'attr_{key}' if key in child_row else key] = value
+            else:
+                # Escalares y listas anidadas, como atributo `value`
+                self._flatten('value', element, depth + 1, child_row, child_keys, child_table)
+            rows.append(child_row)
+
+
+def normalizer_from_env(session, table_name):
+    """Crea un Normalizer si NORMALIZE=true (profundidad en NORMALIZE_DEPTH)."""
+    if os.getenv('NORMALIZE', 'false').lower() != 'true':
+        return None
+    # Importación diferida: etl_service configura su logging al importarse
+    from etl_service import get_dynamodb_key_columns
+
+    key_columns = get_dynamodb_key_columns(session, table_name)
+    return Normalizer(table_name, key_columns, max_depth=int(os.getenv('NORMALIZE_DEPTH', '3')))
+
+
+def export_normalized(normalizer, session, bucket_name, ingest_type, to_mysql=False):
+    """Sube cada tabla normalizada a `{ingest_type}-normalized/{tabla}/` y opcionalmente a MySQL.
+
+    En MySQL las tablas se llaman `{ingest_type}_normalized_{tabla}`, para no
+    pisar la tabla que carga el sink mysql de la ingesta (`{ingest_type}_{tabla}`).
+    """
+    for table, rows in normalizer.tables.items():
+        name = table.replace('-', '_')
+        s3_sink = S3Sink(session, bucket_name, f'{ingest_type}-normalized/{name}/{name}.csv')
+        s3_sink.write_batch(rows)
+        s3_sink.close()
+        if to_mysql:
+            mysql_sink = MySQLSink(f"{ingest_type.replace('-', '_')}_normalized_{name}", normalizer.table_keys[table])
+            mysql_sink.write_batch(rows)
+            mysql_sink.close()
+        logger.info(f"Tabla normalizada {name}: {len(rows)} filas.")
@@ -0,0 +1,138 @@
+import fnmatch
+import glob
+import logging
+import os
+import time
+from botocore.exceptions import BotoCoreError, ClientError
+from aws_retry import CircuitOpenError, get_retry_policy
+
+logger = logging.getLogger(__name__)
+
+# Motores de consulta intercambiables para etl_service. Todos devuelven
+# (columnas, lotes) donde `lotes` es un iterador de listas de tuplas de texto,
+# de modo que los resultados llegan al cargador MySQL sin materializarse.
+
+
+class QueryBackendError(RuntimeError):
+    """Error de un motor de consulta, también al leer los lotes de resultados."""
+
+
+def _text_row(row):
+    return tuple(None if val is None else str(val) for val in row)
+
+
+def run_athena_query(athena_client, query, database, output_location, poll_interval=1.0, timeout=900):
+    """Ejecuta la consulta en Athena y devuelve sus resultados por páginas."""
+    retry_policy = get_retry_policy('athena')
+    response = retry_policy.call(
+        athena_client.start_query_execution,
+        QueryString=query,
+        QueryExecutionContext={'Database': database},
+        ResultConfiguration={'OutputLocation': output_location}
+    )
+    execution_id = response['QueryExecutionId']
+
+    deadline = time.monotonic() + timeout
+    while True:
+        execution = retry_policy.call(athena_client.get_query_execution, QueryExecutionId=execution_id)
+        status = execution['QueryExecution']['Status']
+        state = status['State']
+        if state == 'SUCCEEDED':
+            break
+        if state in ('FAILED', 'CANCELLED'):
+            raise RuntimeError(f"La consulta Athena {execution_id} terminó en estado {state}: {status.get('StateChangeReason')}")
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"La consulta Athena {execution_id} no terminó en {timeout}s.")
+        time.sleep(poll_interval)
+
+    first_page = retry_policy.call(athena_client.get_query_results, QueryExecutionId=execution_id)
+    column_info = first_page['ResultSet']['ResultSetMetadata']['ColumnInfo']
+    columns = [col['Name'] for col in column_info]
+
+    def batches():
+        page = first_page
+        # La primera fila de la primera página repite los nombres de columna
+        skip_header = True
+        while True:
+            rows = page['ResultSet']['Rows'][1:] if skip_header else page['ResultSet']['Rows']
+            skip_header = False
+            yield [_text_row(d.get('VarCharValue') for d in row['Data']) for row in rows]
+            if 'NextToken' not in page:
+                break
+            try:
+                page = retry_policy.call(
+                    athena_client.get_query_results,
+                    QueryExecutionId=execution_id,
+                    NextToken=page['NextToken']
+                )
+            except (ClientError, BotoCoreError, CircuitOpenError) as e:
+                raise QueryBackendError(f"Error al leer los resultados de la consulta Athena {execution_id}: {e}") from e
+
+    return columns, batches()
+
+
+def run_duckdb_query(query, sources, threads=None, batch_size=10000):
+    """Ejecuta la consulta con DuckDB embebido sobre los archivos exportados.
+
+    `sources` asocia cada nombre de vista con una ruta (o patrón) local o s3://
+    a CSV o Parquet; las rutas S3 se leen por rangos mediante la extensión httpfs.
+    """
+    try:
+        import duckdb
+    except ImportError:
+        raise QueryBackendError("El motor 'duckdb' requiere el paquete duckdb (pip install duckdb).")
+
+    con = duckdb.connect()
+    try:
+        con.execute(f"SET threads TO {int(threads or os.cpu_count() or 1)}")
+        if any(path.startswith('s3://') for path in sources.values()):
+            con.execute("INSTALL httpfs")
+            con.execute("LOAD httpfs")
+            region = os.getenv('AWS_REGION', 'us-east-1').replace("'", "")
+            con.execute(f"CREATE SECRET (TYPE S3, PROVIDER CREDENTIAL_CHAIN, REGION '{region}')")
+        for view, path in sources.items():
+            reader = 'read_parquet' if path.endswith('.parquet') else 'read_csv_auto'
+            escaped_path = path.replace("'", "''")
+            # Las rutas pueden ser patrones (partes de una exportación); se unen por nombre de columna
+            con.execute(f'CREATE VIEW "{view}" AS SELECT * FROM {reader}(\'{escaped_path}\', union_by_name = true)')
+        result = con.execute(query)
+    except duckdb.Error as e:
+        con.close()
+        raise QueryBackendError(f"Error de DuckDB: {e}") from e
+    columns = [col[0] for col in result.description]
+
+    def batches():
+        try:
+            while True:
+                rows = result.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield [_text_row(row) for row in rows]
+        except duckdb.Error as e:
+            raise QueryBackendError(f"Error de DuckDB al leer los resultados: {e}") from e
+        finally:
+            con.close()
+
+    return columns, batches()
+
+
+def source_exists(path, s3_client=None):
+    """Indica si la ruta (o patrón) local o s3:// coincide con algún archivo."""
+    if not path.startswith('s3://'):
+        return bool(glob.glob(path))
+    bucket_name, _, pattern = path[len('s3://'):].partition('/')
+    # Se listan las claves bajo la parte fija del patrón y se filtran con él
+    prefix = pattern
+    for i, char in enumerate(pattern):
+        if char in '*?[':
+            prefix = pattern[:i]
+            break
+    list_kwargs = {'Bucket': bucket_name, 'Prefix': prefix}
+    retry_policy = get_retry_policy('s3')
+    while True:
+        response = retry_policy.call(s3_client.list_objects_v2, **list_kwargs)
+        if any(fnmatch.fnmatchcase(obj['Key'], pattern) for obj in response.get('Contents', [])):
+            return True
+        if not response.get('IsTruncated'):
+            return False
+        list_kwargs['ContinuationToken'] = response['NextContinuationToken']
@@ -0,0 +1,199 @@
+import base64
+import hashlib
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# Caché local de las páginas crudas de un scan de DynamoDB. Cada entrada es un
+# archivo Arrow IPC (una columna `item` con el elemento en DynamoDB JSON, un
+# record batch por página) más un archivo .json con sus metadatos. Al releer,
+# el archivo se mapea en memoria, de modo que reprocesar (transformar y
+# codificar de nuevo) no vuelve a consultar DynamoDB.
+#
+# Las ejecuciones normales solo escriben en la caché (siempre publican datos
+# recién leídos); las entradas se sirven únicamente cuando se pide
+# explícitamente una repetición (SCAN_CACHE_REPLAY=true).
+
+# Los atributos B/BS llegan como bytes; en la caché se guardan en base64 con esta marca
+_BYTES_MARKER = '__b64__'
+
+
+def _encode_bytes(value):
+    if isinstance(value, (bytes, bytearray)):
+        return {_BYTES_MARKER: base64.b64encode(value).decode('ascii')}
+    raise TypeError(f"Tipo no serializable en la caché: {type(value).__name__}")
+
+
+def _decode_bytes(obj):
+    if len(obj) == 1 and isinstance(obj.get(_BYTES_MARKER), str):
+        return base64.b64decode(obj[_BYTES_MARKER])
+    return obj
+
+
+def encode_item(item):
+    return json.dumps(item, default=_encode_bytes)
+
+
+def decode_item(raw):
+    return json.loads(raw, object_hook=_decode_bytes)
+
+
+class ScanCache:
+    """Caché de scans en disco con expiración por TTL y límite de tamaño total.
+
+    Con `replay=False` (por defecto) cada scan se lee de DynamoDB y se guarda;
+    con `replay=True` se sirve la entrada vigente si existe.
+    """
+
+    def __init__(self, cache_dir, ttl_seconds=86400, max_bytes=5 * 1024 ** 3, replay=False, tmp_max_age=3600,
+                 clock=time.time):
+        self.cache_dir = cache_dir
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.tmp_max_age = tmp_max_age
+        self.replay = replay
+        self.clock = clock
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, table_name, scan_params):
+        """Clave de la entrada: hash de la tabla y de los parámetros del scan."""
+        raw = json.dumps({'table': table_name, 'params': scan_params}, sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _paths(self, key):
+        base = os.path.join(self.cache_dir, key)
+        return f"{base}.arrow", f"{base}.json"
+
+    def _read_meta(self, meta_path):
+        try:
+            with open(meta_path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def read_pages(self, key):
+        """Devuelve un iterador de páginas si la entrada existe y no ha expirado; si no, None."""
+        data_path, meta_path = self._paths(key)
+        meta = self._read_meta(meta_path)
+        if meta is None or not os.path.exists(data_path):
+            return None
+        if self.clock() - meta['created_at'] > self.ttl_seconds:
+            logger.info(f"Entrada de caché {key[:12]} expirada para {meta['table']}.")
+            self._remove(key)
+            return None
+        # La fecha de modificación de los metadatos marca el último uso (para el LRU)
+        os.utime(meta_path)
+        return self._iter_pages(data_path)
+
+    def _iter_pages(self, data_path):
+        import pyarrow as pa
+
+        with pa.memory_map(data_path, 'r') as source:
+            reader = pa.ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                column = reader.get_batch(i).column(0)
+                yield [decode_item(value.as_py()) for value in column]
+
+    def cached_pages(self, table_name, scan_params, fetch_pages):
+        """Obtiene las páginas de `fetch_pages` y las guarda; en modo replay las sirve desde la caché si están."""
+        key = self.key(table_name, scan_params)
+        cached = self.read_pages(key) if self.replay else None
+        if cached is not None:
+            logger.info(f"Scan de {table_name} servido desde la caché local ({key[:12]}).")
+            yield from cached
+            return
+        yield from self._write_through(key, table_name, scan_params, fetch_pages)
+        self.evict()
+
+    def _write_through(self, key, table_name, scan_params, fetch_pages):
+        import pyarrow as pa
+
+        data_path, meta_path = self._paths(key)
+        tmp_path = f"{data_path}.tmp"
+        schema = pa.schema([('item', pa.large_string())])
+        pages = 0
+        items = 0
+        try:
+            with pa.OSFile(tmp_path, 'wb') as sink, pa.ipc.new_file(sink, schema) as writer:
+                for page in fetch_pages:
+                    writer.write_batch(pa.record_batch(
+                        [pa.array([encode_item(item) for item in page], type=pa.large_string())], schema=schema))
+                    pages += 1
+                    items += len(page)
+                    yield page
+        except BaseException:
+            # Scan fallido o abandonado (GeneratorExit): no se deja el archivo parcial
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        # Solo se publica la entrada cuando el scan terminó completo
+        os.replace(tmp_path, data_path)
+        with open(meta_path, 'w', encoding='utf-8') as f:
+            json.dump({'table': table_name, 'params': scan_params, 'created_at': self.clock(),
+                       'pages': pages, 'items': items}, f, default=str)
+        logger.info(f"Scan de {table_name} guardado en caché: {pages} páginas, {items} elementos.")
+
+    def _remove_orphan(self, tmp_path):
+        try:
+            if self.clock() - os.path.getmtime(tmp_path) > self.tmp_max_age:
+                logger.info(f"Eliminando el archivo temporal huérfano {os.path.basename(tmp_path)}.")
+                os.remove(tmp_path)
+        except FileNotFoundError:
+            # Otro proceso lo publicó o lo eliminó entretanto
+            pass
+
+    def _remove(self, key):
+        for path in self._paths(key):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def evict(self):
+        """Elimina entradas expiradas y, si se supera max_bytes, las usadas hace más tiempo.
+
+        También borra los `.tmp` huérfanos (sin escribir desde hace más de
+        `tmp_max_age` segundos) que deja un proceso interrumpido; los de scans
+        en curso se siguen escribiendo y no se tocan.
+        """
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.tmp'):
+                self._remove_orphan(os.path.join(self.cache_dir, name))
+                continue
+            if not name.endswith('.json'):
+                continue
+            key = name[:-len('.json')]
+            data_path, meta_path = self._paths(key)
+            meta = self._read_meta(meta_path)
+            if meta is None or not os.path.exists(data_path) or self.clock() - meta['created_at'] > self.ttl_seconds:
+                self._remove(key)
+                continue
+            entries.append((os.path.getmtime(meta_path), os.path.getsize(data_path), key))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, key in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            logger.info(f"Expulsando la entrada de caché {key[:12]} ({size} bytes).")
+            self._remove(key)
+            total -= size
+
+
+def scan_cache_from_env():
+    """Crea la caché si SCAN_CACHE_DIR está definido y pyarrow disponible; si no, devuelve None."""
+    cache_dir = os.getenv('SCAN_CACHE_DIR')
+    if not cache_dir:
+        return None
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        logger.warning("SCAN_CACHE_DIR está definido pero pyarrow no está instalado; caché desactivada.")
+        return None
+    return ScanCache(
+        cache_dir,
+        ttl_seconds=float(os.getenv('SCAN_CACHE_TTL_SECONDS', '86400')),
+        max_bytes=int(os.getenv('SCAN_CACHE_MAX_BYTES', str(5 * 1024 ** 3))),
+        replay=os.getenv('SCAN_CACHE_REPLAY', 'false').lower() == 'true'
+    )
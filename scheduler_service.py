@@ -0,0 +1,277 @@
+import importlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from dotenv import load_dotenv
+from log_config import setup_logging
+from aws_retry import retry_metrics
+
+# Configurar el logging (escritura en segundo plano). Es la primera llamada del
+# proceso, así que los trabajos también escriben aquí (volumen /logs del contenedor)
+setup_logging(f"/logs/{os.getenv('CONTAINER_NAME', 'scheduler')}.log")
+
+logger = logging.getLogger(__name__)
+
+# Cargar las variables de entorno desde el archivo .env
+load_dotenv()
+
+# Proceso residente que ejecuta los servicios de ingesta y el ETL según su
+# programación. Los módulos se importan una sola vez y comparten la sesión de
+# boto3, los clientes, el pool MySQL y las cachés de esquema entre ejecuciones.
+
+DEFAULT_JOBS = [
+    {'name': 'ingest1', 'module': 'ingest_service1', 'cron': '0 * * * *'},
+    {'name': 'ingest2', 'module': 'ingest_service2', 'cron': '0 * * * *'},
+    {'name': 'ingest3', 'module': 'ingest_service3', 'cron': '0 * * * *'},
+    {'name': 'ingest4', 'module': 'ingest_service4', 'cron': '0 * * * *'},
+    {'name': 'ingest5', 'module': 'ingest_service5', 'cron': '0 * * * *'},
+    {'name': 'etl', 'module': 'etl_service', 'cron': '30 * * * *'},
+]
+
+
+def _parse_cron_field(field, low, high):
+    """Devuelve el conjunto de valores de un campo cron ('*', '*/n', 'a-b', 'a-b/n', listas)."""
+    values = set()
+    for part in field.split(','):
+        step = 1
+        if '/' in part:
+            part, step = part.split('/')
+            step = int(step)
+        if part == '*':
+            start, end = low, high
+        elif '-' in part:
+            start, end = (int(v) for v in part.split('-'))
+        else:
+            start = end = int(part)
+        if start < low or end > high or start > end:
+            raise ValueError(f"Campo cron fuera de rango: {field}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronSchedule:
+    """Expresión cron de 5 campos: minuto hora día-del-mes mes día-de-la-semana (0 = domingo)."""
+
+    def __init__(self, expression):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Expresión cron inválida: {expression}")
+        self.expression = expression
+        self.minutes = _parse_cron_field(fields[0], 0, 59)
+        self.hours = _parse_cron_field(fields[1], 0, 23)
+        self.days = _parse_cron_field(fields[2], 1, 31)
+        self.months = _parse_cron_field(fields[3], 1, 12)
+        self.weekdays = {d % 7 for d in _parse_cron_field(fields[4], 0, 7)}
+        self.times = sorted((hour, minute) for hour in self.hours for minute in self.minutes)
+        # Como en cron, si se restringen día del mes y día de la semana basta con que se cumpla uno
+        self.day_or_weekday = fields[2] != '*' and fields[4] != '*'
+
+    def _matches_day(self, moment):
+        day = moment.day in self.days
+        weekday = (moment.weekday() + 1) % 7 in self.weekdays
+        return (day or weekday) if self.day_or_weekday else (day and weekday)
+
+    def next_after(self, timestamp):
+        start = datetime.fromtimestamp(timestamp).replace(second=0, microsecond=0) + timedelta(minutes=1)
+        day = start.replace(hour=0, minute=0)
+        # Se avanza día a día; un 29 de febrero puede estar a 8 años (2096 -> 2104)
+        for _ in range(366 * 9):
+            if day.month in self.months and self._matches_day(day):
+                for hour, minute in self.times:
+                    moment = day.replace(hour=hour, minute=minute)
+                    if moment >= start:
+                        return moment.timestamp()
+            day += timedelta(days=1)
+        raise ValueError(f"La expresión cron {self.expression} no tiene próximas ejecuciones.")
+
+
+class IntervalSchedule:
+    """Ejecución cada `seconds` segundos."""
+
+    def __init__(self, seconds):
+        self.seconds = float(seconds)
+
+    def next_after(self, timestamp):
+        return timestamp + self.seconds
+
+
+class Job:
+    """Trabajo programado: llama a `main()` del módulo indicado."""
+
+    def __init__(self, name, module, schedule, run=None):
+        self.name = name
+        self.module = module
+        self.schedule = schedule
+        self.run = run
+        self.lock = threading.Lock()
+        self.next_run = None
+        self.running = False
+        self.runs = 0
+        self.failures = 0
+        self.skipped = 0
+        self.last_start = None
+        self.last_duration = None
+        self.last_status = None
+        self.last_error = None
+
+    def target(self):
+        """Función a ejecutar; el módulo se importa una vez y queda en memoria."""
+        if self.run is None:
+            self.run = importlib.import_module(self.module).main
+        return self.run
+
+    def status(self):
+        return {
+            'name': self.name,
+            'module': self.module,
+            'running': self.running,
+            'next_run': self.next_run,
+            'last_start': self.last_start,
+            'last_duration': self.last_duration,
+            'last_status': self.last_status,
+            'last_error': self.last_error,
+            'runs': self.runs,
+            'failures': self.failures,
+            'skipped': self.skipped,
+        }
+
+
+def jobs_from_config(config):
+    """Crea los trabajos a partir de una lista de {'name', 'module', 'cron' | 'interval'}."""
+    jobs = []
+    for entry in config:
+        if 'cron' in entry:
+            schedule = CronSchedule(entry['cron'])
+        else:
+            schedule = IntervalSchedule(entry['interval'])
+        jobs.append(Job(entry['name'], entry.get('module', entry['name']), schedule))
+    return jobs
+
+
+class Scheduler:
+    """Lanza los trabajos vencidos sin solapar ejecuciones del mismo trabajo.
+
+    `clock` y `sleep` se pueden sustituir para simular el paso del tiempo.
+    """
+
+    def __init__(self, jobs, max_workers=4, clock=time.time, sleep=time.sleep):
+        self.jobs = {job.name: job for job in jobs}
+        self.clock = clock
+        self.sleep = sleep
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self.started_at = clock()
+        now = clock()
+        for job in jobs:
+            job.next_run = job.schedule.next_after(now)
+
+    def run_job(self, job):
+        """Ejecuta el trabajo; se llama con `job.lock` ya adquirido por tick() y lo libera al terminar."""
+        job.last_start = self.clock()
+        logger.info(f"Iniciando el trabajo {job.name}...")
+        try:
+            job.target()()
+            job.last_status = 'ok'
+            job.last_error = None
+        except BaseException as e:
+            # SystemExit incluido: un trabajo nunca debe detener el scheduler
+            job.failures += 1
+            job.last_status = 'error'
+            job.last_error = str(e)
+            logger.exception(f"El trabajo {job.name} falló: {e}")
+        finally:
+            job.runs += 1
+            job.last_duration = self.clock() - job.last_start
+            job.running = False
+            job.lock.release()
+            logger.info(f"Trabajo {job.name} terminado en {job.last_duration:.2f}s ({job.last_status}).")
+
+    def tick(self):
+        """Lanza los trabajos vencidos y devuelve cuántos segundos faltan para el siguiente."""
+        now = self.clock()
+        for job in self.jobs.values():
+            if job.next_run <= now:
+                job.next_run = job.schedule.next_after(now)
+                # El lock se toma aquí y no en el hilo del trabajo: una ejecución encolada
+                # que aún no ha empezado también cuenta como en curso
+                if job.lock.acquire(blocking=False):
+                    job.running = True
+                    self.executor.submit(self.run_job, job)
+                else:
+                    job.skipped += 1
+                    logger.warning(f"El trabajo {job.name} sigue en ejecución; se omite esta ejecución.")
+        return max(0.0, min(job.next_run for job in self.jobs.values()) - self.clock())
+
+    def run_forever(self, stop_event=None):
+        stop_event = stop_event or threading.Event()
+        logger.info(f"Scheduler iniciado con {len(self.jobs)} trabajos.")
+        while not stop_event.is_set():
+            # Despertar al menos cada minuto para tolerar cambios de hora
+            self.sleep(min(self.tick(), 60.0))
+        self.executor.shutdown(wait=True)
+
+    def status(self):
+        return {
+            'started_at': self.started_at,
+            'uptime': self.clock() - self.started_at,
+            'jobs': [job.status() for job in self.jobs.values()],
+        }
+
+    def metrics(self):
+        return {
+            'jobs': {job.name: {'runs': job.runs, 'failures': job.failures, 'skipped': job.skipped,
+                                'last_duration': job.last_duration} for job in self.jobs.values()},
+            'retries': retry_metrics(),
+        }
+
+
+def create_http_server(scheduler, host, port):
+    """Servidor HTTP con /health, /status y /metrics en JSON."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            routes = {
+                '/health': lambda: {'status': 'ok'},
+                '/status': scheduler.status,
+                '/metrics': scheduler.metrics,
+            }
+            route = routes.get(self.path.split('?')[0])
+            if route is None:
+                self.send_error(404)
+                return
+            body = json.dumps(route(), default=str).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logger.debug(f"HTTP {self.address_string()} {format % args}")
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+
+def main():
+    config = json.loads(os.getenv('SCHEDULER_JOBS') or 'null') or DEFAULT_JOBS
+    scheduler = Scheduler(jobs_from_config(config), max_workers=int(os.getenv('SCHEDULER_MAX_WORKERS', '4')))
+
+    host = os.getenv('SCHEDULER_HTTP_HOST', '127.0.0.1')
+    port = int(os.getenv('SCHEDULER_HTTP_PORT', '8080'))
+    server = create_http_server(scheduler, host, port)
+    threading.Thread(target=server.serve_forever, name='http', daemon=True).start()
+    logger.info(f"Estado disponible en http://{host}:{port}/status")
+
+    try:
+        scheduler.run_forever()
+    except KeyboardInterrupt:
+        logger.info("Deteniendo el scheduler...")
+    finally:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,400 @@
+import io
+import logging
+import os
+import queue
+import re
+import threading
+import tempfile
+import time
+from aws_retry import CLIENT_CONFIG, get_retry_policy
+from csv_writer import ColumnProfile, collect_fieldnames
+from log_config import ProgressLogger
+from scan_cache import decode_item, encode_item
+
+logger = logging.getLogger(__name__)
+
+# Reparto de una sola pasada del scan hacia varios destinos (sinks). Cada sink
+# consume los lotes en su propio hilo desde una cola acotada; si un sink se
+# retrasa más de `max_stall` segundos se desconecta para no frenar al resto.
+
+_END = object()
+_ABORT = object()
+
+
+def remove_stale_outputs(s3, bucket_name, output_prefix, keep_keys):
+    """Borra las salidas anteriores de una tabla que no forman parte de la publicación actual.
+
+    Son salidas `{output_prefix}.{csv|json}` (scan) y `{output_prefix}-part-NNNNN.{csv|json}`
+    (exportación). Sin esto, al cambiar de modo o reducirse el número de partes el
+    crawler y DuckDB leerían filas duplicadas.
+    """
+    pattern = re.compile(re.escape(output_prefix) + r'(-part-\d{5})?\.(csv|json)')
+    retry_policy = get_retry_policy('s3')
+    list_kwargs = {'Bucket': bucket_name, 'Prefix': output_prefix}
+    stale_keys = []
+    while True:
+        response = retry_policy.call(s3.list_objects_v2, **list_kwargs)
+        stale_keys.extend(
+            obj['Key'] for obj in response.get('Contents', [])
+            if pattern.fullmatch(obj['Key']) and obj['Key'] not in keep_keys
+        )
+        if not response.get('IsTruncated'):
+            break
+        list_kwargs['ContinuationToken'] = response['NextContinuationToken']
+    for key in stale_keys:
+        retry_policy.call(s3.delete_object, Bucket=bucket_name, Key=key)
+        logger.info(f"Salida anterior eliminada: s3://{bucket_name}/{key}")
+    return stale_keys
+
+
+class SpoolingSink:
+    """Base de los sinks de archivo: guarda cada lote en un spool JSON Lines en disco.
+
+    Como en dynamodb_export, las columnas se acumulan en un ColumnProfile y al
+    cerrar el archivo se escribe en una sola pasada con ese esquema, sin
+    mantener los elementos en memoria.
+    """
+
+    def __init__(self, file_format='csv'):
+        self.file_format = file_format
+        self.profile = ColumnProfile()
+        self.spool = None
+
+    def write_batch(self, items):
+        if self.spool is None:
+            self.spool = tempfile.TemporaryFile('w+', encoding='utf-8', dir=os.getenv('EXPORT_TMP_DIR') or None)
+        self.profile.update(items)
+        for item in items:
+            self.spool.write(encode_item(item))
+            self.spool.write('\n')
+
+    def write_output(self, stream):
+        """Escribe el contenido del spool en `stream` (texto). Devuelve el número de filas."""
+        # Importación diferida: dynamodb_export importa este módulo
+        from dynamodb_export import encode_items
+
+        items = ()
+        if self.spool is not None:
+            self.spool.flush()
+            self.spool.seek(0)
+            items = (decode_item(line) for line in self.spool)
+        return encode_items(items, stream, self.file_format, self.profile)
+
+    def discard(self):
+        if self.spool is not None:
+            self.spool.close()
+            self.spool = None
+
+    def abort(self):
+        self.discard()
+
+
+class S3Sink(SpoolingSink):
+    """Sube los elementos a S3 como un único CSV/JSON al cerrar.
+
+    El archivo se genera en disco desde el spool antes de subirlo. Con
+    `replaces` (prefijo de salida de la tabla) se borran después las salidas
+    anteriores de ese prefijo (ver remove_stale_outputs).
+    """
+
+    def __init__(self, session, bucket_name, file_name, file_format='csv', replaces=None):
+        super().__init__(file_format)
+        self.name = 's3'
+        self.s3 = session.client('s3', config=CLIENT_CONFIG)
+        self.bucket_name = bucket_name
+        self.file_name = file_name
+        self.replaces = replaces
+
+    def close(self):
+        try:
+            with tempfile.TemporaryFile(dir=os.getenv('EXPORT_TMP_DIR') or None) as data:
+                text_stream = io.TextIOWrapper(data, encoding='utf-8', newline='')
+                self.write_output(text_stream)
+                text_stream.flush()
+                text_stream.detach()
+
+                def put_object():
+                    data.seek(0)
+                    self.s3.put_object(Bucket=self.bucket_name, Key=self.file_name, Body=data)
+
+                get_retry_policy('s3').call(put_object)
+        finally:
+            self.discard()
+        logger.info(f"Archivo subido a S3: s3://{self.bucket_name}/{self.file_name}")
+        if self.replaces is not None:
+            remove_stale_outputs(self.s3, self.bucket_name, self.replaces, [self.file_name])
+
+
+class LocalFileSink(SpoolingSink):
+    """Escribe los elementos en un archivo local CSV/JSON al cerrar.
+
+    Se escribe primero `<archivo>.tmp` para no dejar un archivo a medias.
+    """
+
+    def __init__(self, file_name, file_format='csv'):
+        super().__init__(file_format)
+        self.name = 'local'
+        self.file_name = file_name
+
+    def close(self):
+        directory = os.path.dirname(self.file_name)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_name = f"{self.file_name}.tmp"
+        try:
+            with open(tmp_name, 'w', newline='', encoding='utf-8') as f:
+                self.write_output(f)
+            os.replace(tmp_name, self.file_name)
+        finally:
+            self.discard()
+            if os.path.exists(tmp_name):
+                os.remove(tmp_name)
+        logger.info(f"Archivo local guardado: {self.file_name}")
+
+
+class SinkAborted(Exception):
+    """Se lanza en la carga en curso cuando su sink se aborta."""
+
+
+class MySQLSink:
+    """Carga los elementos en MySQL a medida que llegan con el cargador de etl_service.
+
+    Con el primer lote se inicia la carga en un hilo propio que consume los
+    lotes desde una cola acotada (`buffer_batches`): si MySQL va más lento que
+    el scan, write_batch se bloquea y la presión llega hasta fan_out. Las
+    columnas nuevas de lotes posteriores se añaden durante la carga. Usa el
+    pool del proceso y el modo de MYSQL_LOAD_MODE (append, merge o swap);
+    merge y swap requieren `key_columns`. Hasta el commit final, abortar
+    deshace la carga.
+    """
+
+    def __init__(self, table_name, key_columns=None, buffer_batches=None):
+        self.name = 'mysql'
+        self.table_name = table_name
+        self.key_columns = key_columns
+        self.queue = queue.Queue(maxsize=buffer_batches or int(os.getenv('SINK_BUFFER_BATCHES', '8')))
+        self.columns = None
+        self.loader = None
+        self.result = None
+        self.error = None
+
+    def write_batch(self, items):
+        if not items:
+            return
+        if self.loader is None:
+            self.columns = collect_fieldnames(items)
+            self.loader = threading.Thread(target=self._load, name=f'mysql-{self.table_name}', daemon=True)
+            self.loader.start()
+        self._put(items)
+
+    def _put(self, message):
+        while True:
+            if not self.loader.is_alive():
+                raise RuntimeError(f"La carga de la tabla MySQL {self.table_name} terminó antes de tiempo: {self.error}")
+            try:
+                self.queue.put(message, timeout=1.0)
+                return
+            except queue.Full:
+                continue
+
+    def _rows(self):
+        """Convierte los lotes de la cola en filas; amplía `columns` con los atributos nuevos."""
+        while True:
+            items = self.queue.get()
+            if items is _END:
+                return
+            if items is _ABORT:
+                raise SinkAborted(f"carga de {self.table_name} abortada")
+            for item in items:
+                for key in item:
+                    if key not in self.columns:
+                        self.columns.append(key)
+            yield [tuple(None if item.get(col) is None else str(item[col]) for col in self.columns) for item in items]
+
+    def _load(self):
+        # Importación diferida: etl_service configura su logging al importarse
+        from etl_service import get_mysql_pool, load_rows_to_mysql
+
+        try:
+            self.result = load_rows_to_mysql(self.columns, self._rows(), self.table_name,
+                                             key_columns=self.key_columns, pool=get_mysql_pool())
+        except SinkAborted:
+            logger.warning(f"Carga de la tabla MySQL {self.table_name} abortada y deshecha.")
+        except Exception as e:
+            self.error = e
+            logger.error(f"Error en la carga de la tabla MySQL {self.table_name}: {e}")
+
+    def close(self):
+        if self.loader is None:
+            logger.warning(f"Sin datos para la tabla MySQL {self.table_name}; no se carga.")
+            return
+        self._put(_END)
+        # fan_out acota la espera total del cierre (SINK_CLOSE_TIMEOUT_SECONDS)
+        self.loader.join()
+        if self.result is None:
+            raise RuntimeError(f"La carga de la tabla MySQL {self.table_name} falló.")
+
+    def abort(self):
+        if self.loader is None:
+            return
+        # Sin bloquear: se vacía la cola y la carga se deshace al leer la marca
+        while True:
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                break
+        self.queue.put_nowait(_ABORT)
+
+
+class SinkWorker(threading.Thread):
+    """Hilo que consume los lotes de un sink desde su cola acotada."""
+
+    def __init__(self, sink, buffer_batches):
+        super().__init__(name=f'sink-{sink.name}', daemon=True)
+        self.sink = sink
+        self.queue = queue.Queue(maxsize=buffer_batches)
+        self.rows = 0
+        self.error = None
+        self.detached = False
+        self.seconds = 0.0
+
+    def stop(self):
+        """Vacía la cola y encola el fin sin bloquear; el sink se aborta tras el lote en curso."""
+        self.detached = True
+        while True:
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                break
+        self.queue.put_nowait(_END)
+
+    def run(self):
+        start_time = time.monotonic()
+        while True:
+            batch = self.queue.get()
+            if batch is _END:
+                break
+            if self.error is not None or self.detached:
+                # Se vacía la cola sin procesar para no bloquear al productor
+                continue
+            try:
+                self.sink.write_batch(batch)
+                self.rows += len(batch)
+            except Exception as e:
+                self.error = e
+                logger.error(f"Error en el sink {self.sink.name}: {e}")
+        try:
+            if self.error is None and not self.detached:
+                self.sink.close()
+            else:
+                self.sink.abort()
+        except Exception as e:
+            self.error = self.error or e
+            logger.error(f"Error al cerrar el sink {self.sink.name}: {e}")
+        self.seconds = time.monotonic() - start_time
+
+
+def transform_pages(pages, transform, stats=None, label='Scan'):
+    """Transforma cada página del scan y actualiza las estadísticas si se indican.
+
+    El progreso se agrega por filas; el detalle de una de cada 100 páginas
+    se registra en DEBUG.
+    """
+    progress = ProgressLogger(logger, label, sample_every=100)
+    for number, page in enumerate(pages, 1):
+        items = transform(page)
+        if stats is not None:
+            stats.update(items)
+        progress.update(len(items), detail=f"página {number}: {len(page)} elementos leídos, {len(items)} filas")
+        yield items
+    progress.done()
+
+
+def _put_or_detach(worker, message, max_stall):
+    try:
+        worker.queue.put(message, timeout=max_stall)
+    except queue.Full:
+        worker.error = TimeoutError(f"sink bloqueado más de {max_stall}s")
+        worker.stop()
+        logger.error(f"El sink {worker.sink.name} superó {max_stall}s sin aceptar datos; se desconecta.")
+
+
+def fan_out(batches, sinks, buffer_batches=None, max_stall=None, close_timeout=None):
+    """Reparte cada lote a todos los sinks en paralelo.
+
+    Cada sink tiene una cola de `buffer_batches` lotes. Si su cola sigue llena
+    tras `max_stall` segundos, el sink se desconecta (se aborta) y el resto
+    continúa sin esperarlo. Terminado el scan, el cierre de todos los sinks
+    se espera como mucho `close_timeout` segundos; los que no terminan se
+    dan por fallidos. Devuelve {nombre: {'rows', 'seconds', 'error'}}.
+    """
+    buffer_batches = buffer_batches or int(os.getenv('SINK_BUFFER_BATCHES', '8'))
+    max_stall = max_stall if max_stall is not None else float(os.getenv('SINK_MAX_STALL_SECONDS', '30'))
+    if close_timeout is None:
+        close_timeout = float(os.getenv('SINK_CLOSE_TIMEOUT_SECONDS', '1800'))
+    workers = [SinkWorker(sink, buffer_batches) for sink in sinks]
+    for worker in workers:
+        worker.start()
+
+    completed = False
+    try:
+        for batch in batches:
+            for worker in workers:
+                if worker.detached or worker.error is not None:
+                    continue
+                _put_or_detach(worker, batch, max_stall)
+        completed = True
+    finally:
+        for worker in workers:
+            if worker.detached:
+                continue
+            if completed:
+                _put_or_detach(worker, _END, max_stall)
+            else:
+                # Error en el productor (p. ej. el scan): ningún sink debe publicar datos parciales
+                worker.stop()
+        deadline = time.monotonic() + close_timeout
+        for worker in workers:
+            # Los sinks desconectados pueden seguir bloqueados en un lote: no se les espera más de max_stall
+            worker.join(timeout=max_stall if worker.detached else max(0.0, deadline - time.monotonic()))
+            if not worker.is_alive():
+                continue
+            if worker.detached:
+                logger.warning(f"El sink {worker.sink.name} sigue ocupado; se abortará al terminar su lote actual.")
+            else:
+                # Si aún no llegó a cerrar se aborta; una carga que ya está cerrando no se puede
+                # interrumpir y, como el hilo es daemon, se descarta al terminar el proceso
+                worker.error = TimeoutError(f"el cierre superó {close_timeout}s")
+                worker.detached = True
+                logger.error(f"El sink {worker.sink.name} no terminó en {close_timeout}s; se da por fallido.")
+
+    results = {}
+    for worker in workers:
+        results[worker.sink.name] = {'rows': worker.rows, 'seconds': worker.seconds,
+                                     'error': None if worker.error is None else str(worker.error)}
+        logger.info(f"Sink {worker.sink.name}: {worker.rows} filas en {worker.seconds:.2f}s"
+                    + (f" (error: {worker.error})" if worker.error else ""))
+    return results
+
+
+def create_sinks(names, session, bucket_name, ingest_type, table_name, file_format='csv'):
+    """Crea los sinks indicados en `names` (p. ej. 's3,mysql,local')."""
+    extension = 'csv' if file_format == 'csv' else 'json'
+    sinks = []
+    for name in [n.strip() for n in names.split(',') if n.strip()]:
+        if name == 's3':
+            # Guardar en una carpeta específica
+            output_prefix = f'{ingest_type}/{table_name}'
+            sinks.append(S3Sink(session, bucket_name, f'{output_prefix}.{extension}', file_format, replaces=output_prefix))
+        elif name == 'mysql':
+            key_columns = None
+            if os.getenv('MYSQL_LOAD_MODE', 'append') in ('merge', 'swap'):
+                from etl_service import get_dynamodb_key_columns  # importación diferida, ver MySQLSink.close
+                key_columns = get_dynamodb_key_columns(session, table_name)
+            sinks.append(MySQLSink(f"{ingest_type.replace('-', '_')}_{table_name.replace('-', '_')}", key_columns))
+        elif name == 'local':
+            local_dir = os.getenv('LOCAL_SINK_DIR', 'output')
+            sinks.append(LocalFileSink(os.path.join(local_dir, ingest_type, f'{table_name}.{extension}'), file_format))
+        else:
+            raise ValueError(f"Sink desconocido: {name}")
+    return sinks
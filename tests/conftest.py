@@ -0,0 +1,130 @@
+import logging
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from log_config import setup_logging  # noqa: E402
+
+# Los servicios configuran el logging al importarse; como solo la primera
+# llamada tiene efecto, las pruebas escriben en un archivo temporal.
+setup_logging(os.path.join(os.environ.get('TMPDIR', '/tmp'), 'ingesta_tests.log'), level=logging.DEBUG)
+
+
+class FakeClock:
+    """Reloj manual: devuelve `now`, que cada prueba avanza a mano."""
+
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+class FakeCursor:
+    """Cursor MySQL falso: registra las sentencias y responde SHOW KEYS/SHOW COLUMNS.
+
+    `tables` asocia cada tabla con sus columnas y `primary_keys` indica qué
+    tablas tienen clave primaria.
+    """
+
+    def __init__(self, tables=None, primary_keys=(), fail_on=None):
+        self.tables = tables or {}
+        self.primary_keys = set(primary_keys)
+        self.fail_on = fail_on
+        self.statements = []
+        self.inserted = {}
+        self.result = []
+        self.rowcount = 0
+        self.closed = False
+
+    def _check(self, sql):
+        import mysql.connector
+
+        if self.fail_on and self.fail_on in sql:
+            raise mysql.connector.Error(msg=f"fallo simulado en: {sql}")
+
+    def execute(self, sql, params=None):
+        sql = ' '.join(sql.split())
+        self._check(sql)
+        self.statements.append(sql)
+        self.result = []
+        if sql.startswith('SHOW KEYS FROM'):
+            table = sql.split('`')[1]
+            self.result = [(table, 0, 'PRIMARY')] if table in self.primary_keys else []
+        elif sql.startswith('SHOW COLUMNS FROM'):
+            self.result = [(col,) for col in self.tables.get(sql.split('`')[1], [])]
+
+    def executemany(self, sql, rows):
+        sql = ' '.join(sql.split())
+        self._check(sql)
+        self.statements.append(sql)
+        self.inserted.setdefault(sql.split('`')[1], []).extend(rows)
+
+    def fetchall(self):
+        return self.result
+
+    def close(self):
+        self.closed = True
+
+
+class FakeConnection:
+    def __init__(self, cursor, pool=None):
+        self._cursor = cursor
+        self.pool = pool
+        self.autocommit = True
+        self.commits = 0
+        self.rollbacks = 0
+        self.closed = False
+
+    def cursor(self):
+        return self._cursor
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        # Como en mysql.connector.pooling, close() devuelve la conexión al pool
+        self.closed = True
+        if self.pool is not None:
+            self.pool.release(self)
+
+
+class FakePool:
+    """Pool falso que, como MySQLConnectionPool, falla al instante si está agotado."""
+
+    def __init__(self, pool_size=2, cursor_factory=FakeCursor):
+        import threading
+
+        self.pool_size = pool_size
+        self.cursor_factory = cursor_factory
+        self.lock = threading.Lock()
+        self.in_use = 0
+        self.max_in_use = 0
+        self.connections = []
+
+    def get_connection(self):
+        import mysql.connector.errors
+
+        with self.lock:
+            if self.in_use >= self.pool_size:
+                raise mysql.connector.errors.PoolError("Failed getting connection; pool exhausted")
+            self.in_use += 1
+            self.max_in_use = max(self.max_in_use, self.in_use)
+        conn = FakeConnection(self.cursor_factory(), pool=self)
+        self.connections.append(conn)
+        return conn
+
+    def release(self, conn):
+        with self.lock:
+            self.in_use -= 1
@@ -0,0 +1,158 @@
+import pytest
+from botocore.exceptions import (ClientError, ConnectTimeoutError, EndpointConnectionError,
+                                 IncompleteReadError, ReadTimeoutError, ResponseStreamingError)
+
+from aws_retry import CircuitBreaker, CircuitOpenError, RetryPolicy, classify_error
+
+
+def client_error(code, status=400):
+    return ClientError({'Error': {'Code': code, 'Message': code},
+                        'ResponseMetadata': {'HTTPStatusCode': status}}, 'Scan')
+
+
+class FakeClient:
+    """Falla con los errores indicados y después responde 'ok'."""
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def scan(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return 'ok'
+
+
+def make_policy(**kwargs):
+    kwargs.setdefault('breaker', CircuitBreaker(failure_threshold=100))
+    return RetryPolicy('dynamodb', sleep=lambda delay: None, rng=lambda: 0.5, **kwargs)
+
+
+def test_classify_error():
+    assert classify_error(client_error('ProvisionedThroughputExceededException')) == 'throttled'
+    assert classify_error(client_error('SomethingBroke', status=503)) == 'transient'
+    assert classify_error(client_error('ValidationException')) == 'fatal'
+    assert classify_error(ValueError()) == 'fatal'
+
+
+@pytest.mark.parametrize('error', [
+    EndpointConnectionError(endpoint_url='https://dynamodb'),
+    ConnectTimeoutError(endpoint_url='https://dynamodb'),
+    ReadTimeoutError(endpoint_url='https://dynamodb'),
+    ResponseStreamingError(error='connection reset'),
+    IncompleteReadError(actual_bytes=10, expected_bytes=100),
+])
+def test_network_errors_are_transient(error):
+    assert classify_error(error) == 'transient'
+
+
+def test_retries_until_success():
+    client = FakeClient([client_error('ThrottlingException'), client_error('InternalError', 500)])
+    policy = make_policy()
+    assert policy.call(client.scan) == 'ok'
+    assert client.calls == 3
+    assert policy.metrics['retries'] == 2
+    assert policy.metrics['throttled'] == 1
+    assert policy.metrics['transient'] == 1
+
+
+def test_retries_network_errors():
+    client = FakeClient([ConnectTimeoutError(endpoint_url='https://dynamodb'),
+                         ResponseStreamingError(error='connection reset'),
+                         IncompleteReadError(actual_bytes=10, expected_bytes=100)])
+    policy = make_policy()
+    assert policy.call(client.scan) == 'ok'
+    assert client.calls == 4
+    assert policy.metrics['transient'] == 3
+
+
+def test_fatal_errors_are_not_retried():
+    client = FakeClient([client_error('ValidationException')])
+    policy = make_policy()
+    with pytest.raises(ClientError):
+        policy.call(client.scan)
+    assert client.calls == 1
+    assert policy.metrics['retries'] == 0
+
+
+def test_budget_limits_retries():
+    client = FakeClient([client_error('ThrottlingException')] * 10)
+    policy = make_policy(max_attempts=10, budget=2)
+    with pytest.raises(ClientError):
+        policy.call(client.scan)
+    # Dos reintentos consumen el presupuesto; el tercer fallo se propaga
+    assert client.calls == 3
+    assert policy.metrics['failures'] == 1
+
+    # Sin presupuesto, el siguiente error no se reintenta
+    client = FakeClient([client_error('ThrottlingException')])
+    with pytest.raises(ClientError):
+        policy.call(client.scan)
+    assert client.calls == 1
+
+
+def test_budget_refills_on_success():
+    policy = make_policy(budget=1, budget_refill=0.5)
+    policy.budget = 0.0
+    policy.call(FakeClient([]).scan)
+    policy.call(FakeClient([]).scan)
+    assert policy.budget == 1.0
+
+
+def test_breaker_opens_and_rejects_calls(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60, clock=clock)
+    policy = make_policy(max_attempts=3, breaker=breaker)
+    client = FakeClient([client_error('ThrottlingException')] * 3)
+    with pytest.raises(ClientError):
+        policy.call(client.scan)
+
+    with pytest.raises(CircuitOpenError):
+        policy.call(client.scan)
+    assert client.calls == 3
+    assert policy.metrics['circuit_open'] == 1
+
+
+def test_half_open_allows_a_single_probe(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60, clock=clock)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert not breaker.allow()
+
+    clock.now = 60
+    assert breaker.allow()
+    # Mientras la prueba está en curso el resto de llamadas se rechaza
+    assert not breaker.allow()
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.allow()
+    assert breaker.allow()
+
+
+def test_failed_probe_reopens_the_circuit(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60, clock=clock)
+    breaker.record_failure()
+    breaker.record_failure()
+
+    clock.now = 60
+    policy = make_policy(max_attempts=1, breaker=breaker)
+    with pytest.raises(ClientError):
+        policy.call(FakeClient([client_error('ThrottlingException')]).scan)
+    assert not breaker.allow()
+
+    clock.now = 119
+    assert not breaker.allow()
+    clock.now = 120
+    assert breaker.allow()
+
+
+def test_fatal_probe_releases_the_half_open_slot(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60, clock=clock)
+    breaker.record_failure()
+    clock.now = 60
+    policy = make_policy(breaker=breaker)
+    with pytest.raises(ClientError):
+        policy.call(FakeClient([client_error('ValidationException')]).scan)
+    assert policy.call(FakeClient([]).scan) == 'ok'
+    assert breaker.opened_at is None
@@ -0,0 +1,47 @@
+import os
+
+import pytest
+
+import aws_session
+from aws_session import get_shared_session, invalidate_shared_session
+
+
+def write_credentials(path, key_id, mtime):
+    path.write_text(f"[default]\naws_access_key_id = {key_id}\naws_secret_access_key = secret\n"
+                    f"aws_session_token = token-{key_id}\n")
+    os.utime(path, (mtime, mtime))
+
+
+@pytest.fixture
+def credentials_file(tmp_path, monkeypatch):
+    for name in ('AWS_ACCESS_KEY_ID', 'AWS_SECRET_ACCESS_KEY', 'AWS_SESSION_TOKEN', 'AWS_PROFILE'):
+        monkeypatch.delenv(name, raising=False)
+    path = tmp_path / 'credentials'
+    write_credentials(path, 'AKIAOLD', 1000)
+    monkeypatch.setenv('AWS_SHARED_CREDENTIALS_FILE', str(path))
+    monkeypatch.setattr(aws_session, '_shared_session', None)
+    return path
+
+
+def test_session_and_clients_are_reused(credentials_file):
+    session = get_shared_session()
+    assert get_shared_session() is session
+    assert session.client('s3') is session.client('s3')
+
+
+def test_session_is_rebuilt_when_credentials_file_changes(credentials_file):
+    session = get_shared_session()
+    client = session.client('s3')
+    assert session.get_credentials().access_key == 'AKIAOLD'
+
+    write_credentials(credentials_file, 'AKIANEW', 2000)
+    renewed = get_shared_session()
+    assert renewed is not session
+    assert renewed.get_credentials().access_key == 'AKIANEW'
+    assert renewed.client('s3') is not client
+
+
+def test_invalidate_forces_a_new_session(credentials_file):
+    session = get_shared_session()
+    invalidate_shared_session()
+    assert get_shared_session() is not session
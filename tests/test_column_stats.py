@@ -0,0 +1,122 @@
+import random
+
+import pytest
+
+from column_stats import OVERFLOW_GROUP, HyperLogLog, QuantileSketch, TableStats, TopK
+
+
+def test_hyperloglog_estimates_distinct_values():
+    hll = HyperLogLog()
+    for i in range(50000):
+        hll.add(f"id-{i % 20000}")
+    assert hll.count() == pytest.approx(20000, rel=0.05)
+
+
+def test_hyperloglog_merge_counts_the_union():
+    left, right = HyperLogLog(), HyperLogLog()
+    for i in range(15000):
+        left.add(i)
+    for i in range(10000, 25000):
+        right.add(i)
+    left.merge(right)
+    assert left.count() == pytest.approx(25000, rel=0.05)
+
+
+def test_hyperloglog_small_cardinality_is_exact_enough():
+    hll = HyperLogLog()
+    for value in ['a', 'b', 'c', 'a']:
+        hll.add(value)
+    assert hll.count() == 3
+
+
+def test_quantile_sketch_accuracy():
+    values = list(range(100000))
+    random.Random(1).shuffle(values)
+    sketch = QuantileSketch()
+    for value in values:
+        sketch.add(value)
+    assert sketch.quantile(0.5) == pytest.approx(50000, rel=0.01)
+    assert sketch.quantile(0.95) == pytest.approx(95000, rel=0.01)
+    assert sketch.quantile(0.0) == 0
+
+
+def test_quantile_sketch_merge_matches_single_pass():
+    low, high = QuantileSketch(), QuantileSketch()
+    for value in range(0, 50000):
+        low.add(value)
+    for value in range(50000, 100000):
+        high.add(value)
+    low.merge(high)
+    assert low.quantile(0.5) == pytest.approx(50000, rel=0.01)
+    assert low.quantile(0.95) == pytest.approx(95000, rel=0.01)
+
+
+def test_quantile_sketch_empty():
+    assert QuantileSketch().quantile(0.5) is None
+
+
+def test_top_k_keeps_heavy_hitters():
+    top = TopK(k=3)
+    stream = ['a'] * 500 + ['b'] * 300 + [f"ruido-{i}" for i in range(400)]
+    random.Random(2).shuffle(stream)
+    for value in stream:
+        top.add(value)
+    assert [value for value, _ in top.top()[:2]] == ['a', 'b']
+
+
+def test_top_k_merge_keeps_heavy_hitters():
+    left, right = TopK(k=3), TopK(k=3)
+    for value in ['a'] * 50 + ['c'] * 10 + ['d'] * 5:
+        left.add(value)
+    for value in ['b'] * 40 + ['a'] * 20 + ['e'] * 5:
+        right.add(value)
+    left.merge(right)
+    assert len(left.counters) <= 3
+    assert [value for value, _ in left.top()[:2]] == ['a', 'b']
+
+
+def test_table_stats_merge_matches_single_pass():
+    items = [{'id': str(i), 'price': float(i), 'tienda': f"t{i % 3}", 'nota': None} for i in range(1000)]
+    single = TableStats(group_by=['tienda'])
+    single.update(items)
+    merged = TableStats(group_by=['tienda'])
+    for start in range(0, 1000, 300):
+        part = merged.empty_copy()
+        part.update(items[start:start + 300])
+        merged.merge(part)
+
+    expected, result = single.to_dict(), merged.to_dict()
+    assert result['rows'] == 1000
+    for key in ('count', 'nulls', 'min', 'max', 'sum'):
+        assert result['columns']['price'][key] == expected['columns']['price'][key]
+    assert 'nota' not in result['columns']
+    assert result['columns']['price']['p50'] == pytest.approx(499.5, rel=0.01)
+    assert sorted(result['groups'], key=lambda g: g['tienda']) == sorted(expected['groups'], key=lambda g: g['tienda'])
+
+
+def test_decode_numbers_gives_numeric_stats_for_text_attributes():
+    stats = TableStats(decode_numbers=True)
+    stats.update([{'price': '10.5', 'qty': '3', 'sku': 'A-1'}, {'price': '-2', 'qty': '1e2', 'sku': 'nan'}])
+    columns = stats.to_dict()['columns']
+    assert (columns['price']['min'], columns['price']['max'], columns['price']['sum']) == (-2, 10.5, 8.5)
+    assert columns['qty']['sum'] == 103.0
+    assert 'min' not in columns['sku']
+    assert sorted(value for value, _ in columns['sku']['top']) == ['A-1', 'nan']
+
+
+def test_text_numbers_are_not_decoded_by_default():
+    stats = TableStats()
+    stats.update([{'price': '10.5'}])
+    assert 'min' not in stats.to_dict()['columns']['price']
+
+
+def test_groups_are_capped():
+    stats = TableStats(group_by=['id'], max_groups=2)
+    stats.update([{'id': str(i), 'v': 1} for i in range(5)])
+    other = stats.empty_copy()
+    other.update([{'id': 'x', 'v': 1}])
+    stats.merge(other)
+    groups = {group['id']: group for group in stats.to_dict()['groups']}
+    assert len(groups) == 3
+    assert groups[OVERFLOW_GROUP]['count'] == 4
+    assert groups[OVERFLOW_GROUP]['sums'] == {'v': 4}
@@ -0,0 +1,58 @@
+import io
+
+import pandas as pd
+import pytest
+
+from csv_writer import collect_fieldnames, csv_upload_stream, find_float_columns, save_csv_file, write_csv
+
+# Casos comparados con `pd.DataFrame(items).to_csv(index=False)`
+CASES = {
+    'empty': [],
+    'sparse_columns': [{'a': 'x'}, {'b': 'y'}, {'c': 'z', 'a': 'w'}],
+    'ints': [{'n': 1}, {'n': -2}, {'n': 10 ** 12}],
+    'ints_with_missing': [{'n': 1}, {'m': 'x'}, {'n': 3}],
+    'ints_with_none': [{'n': 1}, {'n': None}],
+    'int_float_promotion': [{'n': 1}, {'n': 2.5}, {'n': 3}],
+    'floats': [{'f': 0.1 + 0.2}, {'f': 1e20}, {'f': -0.0}, {'f': 1.5e-7}],
+    'bools': [{'b': True}, {'b': False}],
+    'bools_with_missing': [{'b': True}, {'x': 1}, {'b': False}],
+    'mixed_types': [{'v': 1}, {'v': 'uno'}, {'v': 2.5}, {'v': True}],
+    'quoting': [
+        {'s': 'a,b'}, {'s': 'comillas "dobles"'}, {'s': 'salto\nde línea'}, {'s': ' espacios '}, {'s': ''},
+    ],
+    'unicode': [{'ciudad': 'São Paulo', 'nota': 'ñandú'}],
+    'json_strings': [{'m': '{"a": 1, "b": [1, 2]}'}],
+}
+
+
+@pytest.mark.parametrize('items', list(CASES.values()), ids=list(CASES))
+def test_matches_pandas_to_csv(items):
+    stream = io.StringIO()
+    rows = write_csv(items, stream)
+    assert rows == len(items)
+    assert stream.getvalue() == pd.DataFrame(items).to_csv(index=False)
+
+
+def test_collect_fieldnames_keeps_first_appearance_order():
+    assert collect_fieldnames([{'b': 1, 'a': 2}, {'c': 3, 'a': 4}]) == ['b', 'a', 'c']
+
+
+def test_find_float_columns():
+    items = [{'i': 1, 'f': 1.5, 'm': 1, 's': 'x', 'b': True}, {'i': 2, 'f': 2, 's': 1}]
+    assert find_float_columns(items, collect_fieldnames(items)) == {'f', 'm'}
+
+
+def test_explicit_schema_writes_iterators_in_one_pass():
+    stream = io.StringIO()
+    items = iter([{'b': 2, 'a': 1}, {'a': 3}])
+    assert write_csv(items, stream, fieldnames=['a', 'b'], float_columns={'b'}) == 2
+    assert stream.getvalue() == 'a,b\n1,2.0\n3,\n'
+
+
+def test_upload_stream_and_file(tmp_path):
+    items = CASES['quoting']
+    expected = pd.DataFrame(items).to_csv(index=False)
+    assert csv_upload_stream(items).read().decode('utf-8') == expected
+    path = tmp_path / 'salida.csv'
+    save_csv_file(items, str(path))
+    assert path.read_text(encoding='utf-8') == expected
@@ -0,0 +1,141 @@
+import csv
+import gzip
+import io
+import json
+import os
+
+import boto3
+import pytest
+from moto import mock_aws
+
+from column_stats import TableStats
+from csv_writer import write_csv
+from dynamodb_export import convert_local_export, convert_s3_export, read_export_items, write_json_array
+from ingest_service5 import transform_items
+
+# Dos archivos con columnas en distinto orden y atributos que solo aparecen en uno
+EXPORT_FILES = [
+    [
+        {'id': {'S': 'a'}, 'total': {'N': '10'}, 'status': {'S': 'paid'}},
+        {'id': {'S': 'b'}, 'total': {'N': '2.5'}},
+    ],
+    [
+        {'status': {'S': 'open'}, 'id': {'S': 'c'}, 'region': {'S': 'eu'}},
+        {'id': {'S': 'd'}, 'total': {'N': '7'}, 'address': {'M': {'city': {'S': 'Lima'}}}},
+    ],
+]
+
+
+def export_lines(items):
+    return ''.join(json.dumps({'Item': item}) + '\n' for item in items)
+
+
+@pytest.fixture
+def export_dir(tmp_path):
+    data_dir = tmp_path / 'export' / 'data'
+    data_dir.mkdir(parents=True)
+    for i, items in enumerate(EXPORT_FILES):
+        with gzip.open(data_dir / f'file-{i}.json.gz', 'wt', encoding='utf-8') as f:
+            f.write(export_lines(items))
+    return tmp_path / 'export'
+
+
+def all_items():
+    return transform_items([item for items in EXPORT_FILES for item in items])
+
+
+def read_parts(output_dir, file_format='csv'):
+    names = sorted(name for name in os.listdir(output_dir) if name.endswith(f'.{file_format}'))
+    return [(output_dir / name).read_text(encoding='utf-8') for name in names]
+
+
+def test_read_export_items(export_dir):
+    with open(export_dir / 'data' / 'file-0.json.gz', 'rb') as f:
+        assert list(read_export_items(f)) == EXPORT_FILES[0]
+
+
+def test_parts_share_the_same_columns(export_dir, tmp_path):
+    output_dir = tmp_path / 'output'
+    rows = convert_local_export(str(export_dir), str(output_dir), transform_items, max_workers=2)
+    assert rows == 4
+
+    parts = read_parts(output_dir)
+    assert len(parts) == 2
+    headers = [part.splitlines()[0] for part in parts]
+    assert headers[0] == headers[1] == 'id,total,status,region,address_city'
+
+    # Las partes concatenadas equivalen a escribir todos los elementos en un único CSV
+    expected = io.StringIO()
+    write_csv(all_items(), expected)
+    combined = parts[0] + ''.join(part.split('\n', 1)[1] for part in parts[1:])
+    assert combined == expected.getvalue()
+
+
+def test_float_columns_are_decided_across_parts(export_dir, tmp_path):
+    output_dir = tmp_path / 'output'
+    convert_local_export(str(export_dir), str(output_dir), transform_items)
+    rows = [row for part in read_parts(output_dir) for row in list(csv.DictReader(io.StringIO(part)))]
+    # 'total' tiene enteros, un flotante y un valor ausente: se escribe como flotante en todas las partes
+    assert [row['total'] for row in rows] == ['10.0', '2.5', '', '7.0']
+
+
+def test_stale_parts_are_removed(export_dir, tmp_path):
+    output_dir = tmp_path / 'output'
+    output_dir.mkdir()
+    for name in ('part-00002.csv', 'part-00003.csv'):
+        (output_dir / name).write_text('old\n', encoding='utf-8')
+    (output_dir / 'notes.txt').write_text('keep\n', encoding='utf-8')
+
+    convert_local_export(str(export_dir), str(output_dir), transform_items)
+    assert sorted(os.listdir(output_dir)) == ['notes.txt', 'part-00000.csv', 'part-00001.csv']
+
+
+def test_json_parts_match_json_dump(export_dir, tmp_path):
+    output_dir = tmp_path / 'output'
+    convert_local_export(str(export_dir), str(output_dir), transform_items, file_format='json')
+    parts = read_parts(output_dir, 'json')
+    assert parts == [json.dumps(transform_items(items), indent=4) for items in EXPORT_FILES]
+
+
+def test_write_json_array_empty():
+    stream = io.StringIO()
+    assert write_json_array([], stream) == 0
+    assert stream.getvalue() == json.dumps([], indent=4)
+
+
+def test_stats_are_merged_across_parts(export_dir, tmp_path):
+    stats = TableStats()
+    convert_local_export(str(export_dir), str(tmp_path / 'output'), transform_items, stats=stats)
+    assert stats.to_dict()['rows'] == 4
+
+
+@mock_aws
+def test_convert_s3_export_replaces_previous_outputs(tmp_path):
+    session = boto3.Session(region_name='us-east-1')
+    s3 = session.client('s3')
+    s3.create_bucket(Bucket='exports')
+    s3.create_bucket(Bucket='data')
+
+    manifest = ''
+    for i, items in enumerate(EXPORT_FILES):
+        key = f'dynamodb-exports/orders/data/file-{i}.json.gz'
+        s3.put_object(Bucket='exports', Key=key, Body=gzip.compress(export_lines(items).encode('utf-8')))
+        manifest += json.dumps({'dataFileS3Key': key}) + '\n'
+    s3.put_object(Bucket='exports', Key='dynamodb-exports/orders/manifest-files.json', Body=manifest.encode('utf-8'))
+
+    # Salidas de ejecuciones anteriores: el archivo del scan y una parte que ya no existe
+    for key in ('ingest-service-5/orders.csv', 'ingest-service-5/orders-part-00002.csv', 'ingest-service-5/orders_v2.csv'):
+        s3.put_object(Bucket='data', Key=key, Body=b'old\n')
+
+    description = {'S3Bucket': 'exports', 'ExportManifest': 'dynamodb-exports/orders/manifest-summary.json'}
+    rows = convert_s3_export(session, description, 'data', 'ingest-service-5/orders', transform_items)
+    assert rows == 4
+
+    keys = sorted(obj['Key'] for obj in s3.list_objects_v2(Bucket='data')['Contents'])
+    assert keys == ['ingest-service-5/orders-part-00000.csv', 'ingest-service-5/orders-part-00001.csv',
+                    'ingest-service-5/orders_v2.csv']
+    headers = {
+        s3.get_object(Bucket='data', Key=key)['Body'].read().decode('utf-8').splitlines()[0]
+        for key in keys[:2]
+    }
+    assert headers == {'id,total,status,region,address_city'}
@@ -0,0 +1,138 @@
+import logging
+
+import pytest
+
+from conftest import FakeCursor, FakePool
+from etl_service import bulk_insert, column_definitions, load_rows_to_mysql
+
+PK_T = "SHOW KEYS FROM `t` WHERE Key_name = 'PRIMARY'"
+
+
+def load(cursor, columns=('id', 'v'), batches=None, mode='merge', key_columns=('id',), delete_missing=False):
+    pool = FakePool(cursor_factory=lambda: cursor)
+    if batches is None:
+        batches = [[('a', '1'), ('b', '2')]]
+    result = load_rows_to_mysql(list(columns), batches, 't', key_columns=list(key_columns), mode=mode,
+                                delete_missing=delete_missing, pool=pool)
+    return result, pool
+
+
+def statements_without_session(cursor):
+    return [s for s in cursor.statements if not s.startswith('SET SESSION')]
+
+
+def test_key_columns_follow_dynamodb_limits():
+    assert column_definitions(['pk', 'sk', 'v'], ['pk', 'sk']) == (
+        '`pk` VARBINARY(2048) NOT NULL, `sk` VARBINARY(1024) NOT NULL, `v` TEXT, PRIMARY KEY (`pk`, `sk`)'
+    )
+    assert column_definitions(['v'], []) == '`v` TEXT'
+
+
+def test_merge_statement_sequence():
+    cursor = FakeCursor(tables={'t': ['id', 'v']}, primary_keys={'t'})
+    result, pool = load(cursor, delete_missing=True)
+    assert result['rows'] == 2
+    assert statements_without_session(cursor) == [
+        'CREATE TABLE IF NOT EXISTS `t` (`id` VARBINARY(2048) NOT NULL, `v` TEXT, PRIMARY KEY (`id`))',
+        'SHOW COLUMNS FROM `t`',
+        PK_T,
+        'DROP TABLE IF EXISTS `t_staging`',
+        'CREATE TABLE `t_staging` (`id` VARBINARY(2048) NOT NULL, `v` TEXT)',
+        'INSERT INTO `t_staging` (`id`, `v`) VALUES (%s, %s)',
+        'ALTER TABLE `t_staging` ADD PRIMARY KEY (`id`)',
+        'INSERT INTO `t` (`id`, `v`) SELECT `id`, `v` FROM `t_staging` ON DUPLICATE KEY UPDATE `v` = VALUES(`v`)',
+        'DELETE t FROM `t` t LEFT JOIN `t_staging` s ON t.`id` = s.`id` WHERE s.`id` IS NULL',
+        'DROP TABLE IF EXISTS `t_staging`',
+    ]
+    assert cursor.inserted['t_staging'] == [('a', '1'), ('b', '2')]
+    assert pool.connections[0].commits == 1 and pool.in_use == 0
+
+
+def test_empty_staging_does_not_delete_missing_rows():
+    cursor = FakeCursor(tables={'t': ['id', 'v']}, primary_keys={'t'})
+    result, _ = load(cursor, batches=[[]], delete_missing=True)
+    assert result['rows'] == 0
+    assert not any(s.startswith('DELETE') for s in cursor.statements)
+    assert statements_without_session(cursor)[-1] == 'DROP TABLE IF EXISTS `t_staging`'
+
+
+def test_merge_rebuilds_append_table_without_primary_key():
+    # Tabla creada en modo append: sin clave primaria y con una columna extra
+    cursor = FakeCursor(tables={'t': ['id', 'v', 'old']})
+    load(cursor)
+    statements = statements_without_session(cursor)
+    start = statements.index(PK_T)
+    assert statements[start:start + 10] == [
+        PK_T,
+        'DROP TABLE IF EXISTS `t_dedup`',
+        'DROP TABLE IF EXISTS `t_old`',
+        'CREATE TABLE `t_dedup` LIKE `t`',
+        'ALTER TABLE `t_dedup` MODIFY COLUMN `id` VARBINARY(2048) NOT NULL',
+        'ALTER TABLE `t_dedup` ADD PRIMARY KEY (`id`)',
+        'SHOW COLUMNS FROM `t`',
+        'INSERT INTO `t_dedup` (`id`, `v`, `old`) SELECT `id`, `v`, `old` FROM `t` WHERE `id` IS NOT NULL '
+        'ON DUPLICATE KEY UPDATE `id` = VALUES(`id`), `v` = VALUES(`v`), `old` = VALUES(`old`)',
+        'RENAME TABLE `t` TO `t_old`, `t_dedup` TO `t`',
+        'DROP TABLE IF EXISTS `t_old`',
+    ]
+    # El merge continúa sobre la tabla reconstruida
+    assert statements[start + 10] == 'DROP TABLE IF EXISTS `t_staging`'
+
+
+def test_new_columns_are_added_before_the_merge():
+    cursor = FakeCursor(tables={'t': ['id']}, primary_keys={'t'})
+    load(cursor)
+    assert 'ALTER TABLE `t` ADD COLUMN `v` TEXT' in cursor.statements
+
+
+@pytest.mark.parametrize('mode', ['merge', 'swap'])
+@pytest.mark.parametrize('key_columns', [(), ('id', 'sk')])
+def test_missing_key_columns_are_rejected(mode, key_columns):
+    cursor = FakeCursor()
+    result, pool = load(cursor, mode=mode, key_columns=key_columns)
+    assert result is None
+    assert pool.connections == [] and cursor.statements == []
+
+
+def test_swap_statement_sequence():
+    cursor = FakeCursor()
+    result, _ = load(cursor, mode='swap')
+    assert result['rows'] == 2
+    assert statements_without_session(cursor) == [
+        'DROP TABLE IF EXISTS `t_new`',
+        'DROP TABLE IF EXISTS `t_old`',
+        'CREATE TABLE `t_new` (`id` VARBINARY(2048) NOT NULL, `v` TEXT)',
+        'INSERT INTO `t_new` (`id`, `v`) VALUES (%s, %s)',
+        'ALTER TABLE `t_new` ADD PRIMARY KEY (`id`)',
+        'CREATE TABLE IF NOT EXISTS `t` LIKE `t_new`',
+        'RENAME TABLE `t` TO `t_old`, `t_new` TO `t`',
+        'DROP TABLE IF EXISTS `t_old`',
+    ]
+
+
+def test_append_inserts_in_batches():
+    cursor = FakeCursor(tables={'t': ['id', 'v']})
+    rows = [(str(i), 'x') for i in range(2500)]
+    result, _ = load(cursor, mode='append', key_columns=(), batches=[rows[:1500], rows[1500:]])
+    assert result['rows'] == 2500
+    assert cursor.statements.count('INSERT INTO `t` (`id`, `v`) VALUES (%s, %s)') == 3
+    assert cursor.inserted['t'] == rows
+
+
+def test_bulk_insert_reports_sampled_batch_details(caplog):
+    rows = [(str(i),) for i in range(250)]
+    with caplog.at_level(logging.DEBUG, logger='etl_service'):
+        assert bulk_insert(FakeCursor(), 't', ['id'], [rows], batch_size=2) == 250
+    samples = [r.getMessage() for r in caplog.records if 'muestra' in r.getMessage()]
+    assert samples == [
+        'Inserción en t (muestra 1/100): lote 1: filas 1-2',
+        'Inserción en t (muestra 1/100): lote 101: filas 201-202',
+    ]
+
+
+def test_mysql_error_rolls_back_and_returns_the_connection():
+    cursor = FakeCursor(fail_on='RENAME TABLE')
+    result, pool = load(cursor, mode='swap')
+    assert result is None
+    conn = pool.connections[0]
+    assert conn.rollbacks == 1 and conn.commits == 0 and pool.in_use == 0
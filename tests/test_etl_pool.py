@@ -0,0 +1,58 @@
+import threading
+import time
+
+import mysql.connector.errors
+import pytest
+
+from conftest import FakeCursor, FakePool
+from etl_service import get_mysql_connection, load_rows_to_mysql, load_tables_parallel
+
+
+class SlowCursor(FakeCursor):
+    """Retiene la conexión un momento para que las cargas se solapen."""
+
+    def executemany(self, sql, rows):
+        time.sleep(0.05)
+        super().executemany(sql, rows)
+
+
+def load_rows(table_name, pool, fail=False):
+    if fail:
+        raise RuntimeError("fallo simulado")
+    return load_rows_to_mysql(['id', 'v'], [[('a', '1'), ('b', '2')]], table_name, mode='append', pool=pool)
+
+
+def test_get_connection_waits_for_a_free_connection():
+    pool = FakePool(pool_size=1)
+    held = get_mysql_connection(pool)
+    threading.Timer(0.1, held.close).start()
+    start = time.monotonic()
+    conn = get_mysql_connection(pool, timeout=5, poll_interval=0.01)
+    assert time.monotonic() - start >= 0.05
+    conn.close()
+    assert pool.in_use == 0
+
+
+def test_get_connection_gives_up_after_timeout():
+    pool = FakePool(pool_size=1)
+    held = get_mysql_connection(pool)
+    with pytest.raises(mysql.connector.errors.PoolError):
+        get_mysql_connection(pool, timeout=0.05, poll_interval=0.01)
+    held.close()
+
+
+def test_parallel_load_with_more_workers_than_connections():
+    pool = FakePool(pool_size=2, cursor_factory=SlowCursor)
+    jobs = [{'table_name': f"t{i}"} for i in range(6)]
+    results = load_tables_parallel(jobs, pool=pool, max_workers=6, loader=load_rows)
+    assert sorted(r['table'] for r in results) == [f"t{i}" for i in range(6)]
+    assert pool.max_in_use == 2
+    assert pool.in_use == 0
+
+
+def test_parallel_load_isolates_failed_tables():
+    pool = FakePool(pool_size=2)
+    jobs = [{'table_name': 't0'}, {'table_name': 't1', 'fail': True}, {'table_name': 't2'}]
+    results = load_tables_parallel(jobs, pool=pool, loader=load_rows)
+    assert sorted(r['table'] for r in results) == ['t0', 't2']
+    assert pool.in_use == 0
@@ -0,0 +1,34 @@
+import json
+
+import boto3
+from moto import mock_aws
+
+from column_stats import TableStats
+from ingest_pipeline import run_ingest
+from ingest_service2 import transform_items
+
+
+@mock_aws
+def test_scan_to_local_sink_with_stats(tmp_path, monkeypatch):
+    monkeypatch.setenv('INGEST_MODE', 'scan')
+    monkeypatch.setenv('INGEST_SINKS', 'local')
+    monkeypatch.setenv('LOCAL_SINK_DIR', str(tmp_path))
+    monkeypatch.delenv('SCAN_CACHE_DIR', raising=False)
+    monkeypatch.setenv('NORMALIZE', 'false')
+    session = boto3.Session(region_name='us-east-1')
+    dynamodb = session.client('dynamodb')
+    dynamodb.create_table(TableName='orders', KeySchema=[{'AttributeName': 'id', 'KeyType': 'HASH'}],
+                          AttributeDefinitions=[{'AttributeName': 'id', 'AttributeType': 'S'}],
+                          BillingMode='PAY_PER_REQUEST')
+    for i in range(3):
+        dynamodb.put_item(TableName='orders', Item={'id': {'S': f'o{i}'}, 'total': {'N': str(i * 10)}})
+    session.client('s3').create_bucket(Bucket='data')
+
+    stats = TableStats(decode_numbers=True)
+    run_ingest(session, 'ingest-service-2', 'orders', 'data', transform_items, stats=stats)
+
+    lines = (tmp_path / 'ingest-service-2' / 'orders.csv').read_text(encoding='utf-8').splitlines()
+    assert lines[0] == 'id,total'
+    assert sorted(lines[1:]) == ['o0,0', 'o1,10', 'o2,20']
+    body = session.client('s3').get_object(Bucket='data', Key='ingest-service-2-stats/orders.stats.json')['Body']
+    assert json.loads(body.read())['columns']['total']['sum'] == 30
@@ -0,0 +1,37 @@
+import logging
+
+from log_config import ProgressLogger
+
+
+def test_progress_samples_details(caplog, clock):
+    logger = logging.getLogger('test_progress')
+    with caplog.at_level(logging.DEBUG, logger='test_progress'):
+        progress = ProgressLogger(logger, 'Prueba', sample_every=1, clock=clock)
+        for i in range(3):
+            progress.update(detail=f'elemento {i}')
+    assert [r.getMessage() for r in caplog.records if r.levelno == logging.DEBUG] == [
+        f'Prueba (muestra 1/1): elemento {i}' for i in range(3)
+    ]
+
+
+def test_progress_samples_one_in_n(caplog, clock):
+    logger = logging.getLogger('test_progress')
+    with caplog.at_level(logging.DEBUG, logger='test_progress'):
+        progress = ProgressLogger(logger, 'Prueba', sample_every=3, clock=clock)
+        for i in range(7):
+            progress.update(detail=i)
+    samples = [r.getMessage() for r in caplog.records if r.levelno == logging.DEBUG]
+    assert samples == ['Prueba (muestra 1/3): 0', 'Prueba (muestra 1/3): 3', 'Prueba (muestra 1/3): 6']
+
+
+def test_progress_reports_at_interval(caplog, clock):
+    logger = logging.getLogger('test_progress')
+    with caplog.at_level(logging.INFO, logger='test_progress'):
+        progress = ProgressLogger(logger, 'Prueba', total=10, interval=5.0, clock=clock)
+        progress.update(4)
+        clock.now = 5.0
+        progress.update(4)
+        progress.update(2)
+        progress.done()
+    messages = [r.getMessage() for r in caplog.records if r.levelno == logging.INFO]
+    assert messages == ['Prueba en curso: 8/10 en 5.00s (2/s)', 'Prueba completado: 10/10 en 5.00s (2/s)']
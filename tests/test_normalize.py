@@ -0,0 +1,112 @@
+import json
+
+import boto3
+from moto import mock_aws
+
+from normalize import Normalizer, export_normalized
+from sinks import create_sinks
+
+ITEM = {
+    'id': {'S': 'o1'},
+    'total': {'N': '12.5'},
+    'customer': {'M': {'name': {'S': 'Ana'}, 'address': {'M': {'city': {'S': 'Lima'}}}}},
+    'tags': {'SS': ['a', 'b']},
+    'lines': {'L': [
+        {'M': {'sku': {'S': 'x'}, 'qty': {'N': '2'}, 'serials': {'L': [{'S': 's1'}, {'S': 's2'}]}}},
+    ]},
+    'matrix': {'L': [{'L': [{'N': '1'}, {'N': '2'}]}, {'N': '3'}]},
+}
+
+
+def normalize(max_depth):
+    normalizer = Normalizer('orders', ['id'], max_depth=max_depth)
+    normalizer.add_items([ITEM])
+    return normalizer
+
+
+def test_maps_flatten_and_lists_become_child_tables():
+    normalizer = normalize(max_depth=3)
+    assert normalizer.tables['orders'] == [
+        {'id': 'o1', 'total': 12.5, 'customer_name': 'Ana', 'customer_address_city': 'Lima'}
+    ]
+    assert normalizer.tables['orders__tags'] == [
+        {'parent_id': 'o1', '_pos': 0, 'value': 'a'}, {'parent_id': 'o1', '_pos': 1, 'value': 'b'}
+    ]
+    assert normalizer.tables['orders__lines'] == [{'parent_id': 'o1', '_pos': 0, 'sku': 'x', 'qty': 2}]
+    assert normalizer.tables['orders__lines__serials'] == [
+        {'parent_id': 'o1', 'lines_pos': 0, '_pos': 0, 'value': 's1'},
+        {'parent_id': 'o1', 'lines_pos': 0, '_pos': 1, 'value': 's2'},
+    ]
+
+
+def test_lists_inside_lists_become_grandchildren():
+    normalizer = normalize(max_depth=3)
+    assert normalizer.tables['orders__matrix'] == [{'parent_id': 'o1', '_pos': 0}, {'parent_id': 'o1', '_pos': 1, 'value': 3}]
+    assert normalizer.tables['orders__matrix__value'] == [
+        {'parent_id': 'o1', 'matrix_pos': 0, '_pos': 0, 'value': 1},
+        {'parent_id': 'o1', 'matrix_pos': 0, '_pos': 1, 'value': 2},
+    ]
+    assert normalizer.table_keys['orders__matrix__value'] == ['parent_id', 'matrix_pos', '_pos']
+
+
+def test_maps_and_lists_share_the_depth_limit():
+    normalizer = normalize(max_depth=2)
+    # Nivel 1 se expande; lo que está en el nivel 2 queda como JSON
+    [row] = normalizer.tables['orders']
+    assert row['customer_name'] == 'Ana'
+    assert json.loads(row['customer_address']) == {'city': 'Lima'}
+    assert json.loads(normalizer.tables['orders__lines'][0]['serials']) == ['s1', 's2']
+    assert json.loads(normalizer.tables['orders__matrix'][0]['value']) == [1, 2]
+    assert 'orders__lines__serials' not in normalizer.tables
+
+    normalizer = normalize(max_depth=1)
+    assert list(normalizer.tables) == ['orders']
+    [row] = normalizer.tables['orders']
+    assert json.loads(row['customer']) == {'name': 'Ana', 'address': {'city': 'Lima'}}
+    assert json.loads(row['tags']) == ['a', 'b']
+
+
+def test_element_attributes_do_not_overwrite_child_keys():
+    normalizer = Normalizer('orders', ['id'], max_depth=3)
+    normalizer.add_items([{
+        'id': {'S': 'o1'},
+        'lines': {'L': [{'M': {'id': {'S': 'L-1'}, 'parent_id': {'S': 'p'}, '_pos': {'N': '9'},
+                               'parts': {'L': [{'M': {'lines_pos': {'N': '7'}, 'sku': {'S': 'x'}}}]}}}]},
+    }])
+    assert normalizer.tables['orders__lines'] == [
+        {'parent_id': 'o1', '_pos': 0, 'id': 'L-1', 'attr_parent_id': 'p', 'attr__pos': 9}
+    ]
+    assert normalizer.tables['orders__lines__parts'] == [
+        {'parent_id': 'o1', 'lines_pos': 0, '_pos': 0, 'attr_lines_pos': 7, 'sku': 'x'}
+    ]
+
+
+@mock_aws
+def test_normalized_tables_do_not_replace_the_ingest_table(monkeypatch):
+    import etl_service
+
+    loads = {}
+
+    def fake_load(columns, batches, table_name, key_columns=None, pool=None):
+        loads[table_name] = (list(key_columns or []), [row for batch in batches for row in batch])
+        return {'table': table_name, 'rows': len(loads[table_name][1]), 'seconds': 0.0}
+
+    monkeypatch.setattr(etl_service, 'load_rows_to_mysql', fake_load)
+    monkeypatch.setattr(etl_service, 'get_mysql_pool', lambda: None)
+    monkeypatch.setenv('MYSQL_LOAD_MODE', 'append')
+    session = boto3.Session(region_name='us-east-1')
+    session.client('s3').create_bucket(Bucket='data')
+
+    [sink] = create_sinks('mysql', session, 'data', 'ingest-service-1', 'orders')
+    sink.write_batch([{'id': 'o1', 'total': 12.5}])
+    sink.close()
+    export_normalized(normalize(max_depth=3), session, 'data', 'ingest-service-1', to_mysql=True)
+
+    assert loads['ingest_service_1_orders'] == ([], [('o1', '12.5')])
+    assert sorted(loads) == [
+        'ingest_service_1_normalized_orders', 'ingest_service_1_normalized_orders__lines',
+        'ingest_service_1_normalized_orders__lines__serials', 'ingest_service_1_normalized_orders__matrix',
+        'ingest_service_1_normalized_orders__matrix__value', 'ingest_service_1_normalized_orders__tags',
+        'ingest_service_1_orders',
+    ]
+    assert loads['ingest_service_1_normalized_orders__lines'][0] == ['parent_id', '_pos']
@@ -0,0 +1,56 @@
+import pytest
+
+from query_backends import QueryBackendError, run_duckdb_query, source_exists
+
+
+def write_file(path, text):
+    path.write_text(text, encoding='utf-8')
+    return path
+
+
+def test_duckdb_unions_parts_by_column_name(tmp_path):
+    write_file(tmp_path / 'orders-part-00000.csv', 'id,total\n1,10.5\n2,3.0\n')
+    write_file(tmp_path / 'orders-part-00001.csv', 'total,id,status\n7.25,3,paid\n')
+    columns, batches = run_duckdb_query(
+        'SELECT id, total, status FROM "orders" ORDER BY id',
+        {'orders': str(tmp_path / 'orders*.csv')},
+        threads=1, batch_size=2
+    )
+    assert columns == ['id', 'total', 'status']
+    assert list(batches) == [[('1', '10.5', None), ('2', '3.0', None)], [('3', '7.25', 'paid')]]
+
+
+def test_duckdb_missing_source_raises_backend_error(tmp_path):
+    with pytest.raises(QueryBackendError):
+        run_duckdb_query('SELECT * FROM "orders"', {'orders': str(tmp_path / 'orders*.csv')}, threads=1)
+
+
+def test_duckdb_invalid_query_raises_backend_error(tmp_path):
+    write_file(tmp_path / 'orders.csv', 'id\n1\n')
+    with pytest.raises(QueryBackendError):
+        run_duckdb_query('SELECT missing FROM "orders"', {'orders': str(tmp_path / 'orders.csv')}, threads=1)
+
+
+def test_source_exists_local(tmp_path):
+    write_file(tmp_path / 'orders.csv', 'id\n1\n')
+    assert source_exists(str(tmp_path / 'orders*.csv'))
+    assert not source_exists(str(tmp_path / 'customers*.csv'))
+
+
+class FakeS3:
+    def __init__(self, keys):
+        self.keys = keys
+
+    def list_objects_v2(self, Bucket, Prefix, ContinuationToken=None):
+        start = int(ContinuationToken or 0)
+        keys = [key for key in self.keys if key.startswith(Prefix)][start:start + 1]
+        response = {'Contents': [{'Key': key} for key in keys], 'IsTruncated': start + 1 < len(self.keys)}
+        if response['IsTruncated']:
+            response['NextContinuationToken'] = str(start + 1)
+        return response
+
+
+def test_source_exists_s3_matches_pattern_across_pages():
+    s3 = FakeS3(['ingest-service-1/orders_archive.json', 'ingest-service-1/orders.csv'])
+    assert source_exists('s3://bucket/ingest-service-1/orders*.csv', s3)
+    assert not source_exists('s3://bucket/ingest-service-2/orders*.csv', s3)
@@ -0,0 +1,76 @@
+import os
+
+import pytest
+
+from scan_cache import ScanCache
+
+PAGES = [
+    [{'id': {'S': 'a'}, 'blob': {'B': b'\x00\xffdata'}}],
+    [{'id': {'S': 'b'}, 'blobs': {'BS': [b'one', b'two']}, 'meta': {'M': {'__b64__': {'S': 'not bytes'}}}}],
+]
+
+
+def fetch(calls):
+    def pages():
+        calls.append(1)
+        yield from PAGES
+    return pages()
+
+
+def test_binary_attributes_round_trip(tmp_path):
+    cache = ScanCache(str(tmp_path), replay=True)
+    calls = []
+    assert list(cache.cached_pages('orders', {'TableName': 'orders'}, fetch(calls))) == PAGES
+    assert list(cache.cached_pages('orders', {'TableName': 'orders'}, fetch(calls))) == PAGES
+    assert len(calls) == 1
+
+
+def test_normal_runs_only_write_through(tmp_path):
+    cache = ScanCache(str(tmp_path))
+    calls = []
+    list(cache.cached_pages('orders', {'TableName': 'orders'}, fetch(calls)))
+    list(cache.cached_pages('orders', {'TableName': 'orders'}, fetch(calls)))
+    assert len(calls) == 2
+    # La entrada escrita queda disponible para una repetición explícita
+    assert list(cache.read_pages(cache.key('orders', {'TableName': 'orders'}))) == PAGES
+
+
+def test_expired_entries_are_not_replayed(tmp_path, clock):
+    clock.now = 1000.0
+    cache = ScanCache(str(tmp_path), ttl_seconds=60, replay=True, clock=clock)
+    calls = []
+    list(cache.cached_pages('orders', {}, fetch(calls)))
+    clock.now += 61
+    list(cache.cached_pages('orders', {}, fetch(calls)))
+    assert len(calls) == 2
+
+
+def test_failed_scan_leaves_no_temporary_file(tmp_path):
+    def failing():
+        yield PAGES[0]
+        raise RuntimeError("scan interrumpido")
+
+    cache = ScanCache(str(tmp_path))
+    with pytest.raises(RuntimeError):
+        list(cache.cached_pages('orders', {}, failing()))
+    assert os.listdir(tmp_path) == []
+
+
+def test_abandoned_scan_leaves_no_temporary_file(tmp_path):
+    cache = ScanCache(str(tmp_path))
+    pages = cache.cached_pages('orders', {}, fetch([]))
+    next(pages)
+    pages.close()
+    assert os.listdir(tmp_path) == []
+
+
+def test_evict_sweeps_orphaned_temporary_files(tmp_path, clock):
+    clock.now = 1000.0
+    cache = ScanCache(str(tmp_path), tmp_max_age=3600, clock=clock)
+    orphan, in_progress = tmp_path / 'old.arrow.tmp', tmp_path / 'new.arrow.tmp'
+    orphan.write_bytes(b'parcial')
+    in_progress.write_bytes(b'parcial')
+    os.utime(orphan, (clock.now - 3601, clock.now - 3601))
+    os.utime(in_progress, (clock.now - 10, clock.now - 10))
+    cache.evict()
+    assert os.listdir(tmp_path) == ['new.arrow.tmp']
@@ -0,0 +1,137 @@
+import threading
+from datetime import datetime
+
+import pytest
+
+from scheduler_service import CronSchedule, IntervalSchedule, Job, Scheduler, jobs_from_config
+
+
+def at(*args):
+    return datetime(*args).timestamp()
+
+
+def next_run(expression, *start):
+    return datetime.fromtimestamp(CronSchedule(expression).next_after(at(*start)))
+
+
+def test_cron_next_after():
+    assert next_run('*/15 * * * *', 2026, 10, 19, 10, 7) == datetime(2026, 10, 19, 10, 15)
+    assert next_run('30 * * * *', 2026, 10, 19, 10, 30) == datetime(2026, 10, 19, 11, 30)
+    assert next_run('0 2 * * 1-5', 2026, 10, 17, 12, 0) == datetime(2026, 10, 19, 2, 0)
+    assert next_run('0 0 1 * *', 2026, 12, 31, 23, 59) == datetime(2027, 1, 1, 0, 0)
+
+
+def test_cron_day_of_month_or_weekday():
+    # Con ambos campos restringidos basta con que se cumpla uno (sábado 24 antes que el día 1)
+    assert next_run('0 0 1 * 6', 2026, 10, 19, 0, 0) == datetime(2026, 10, 24, 0, 0)
+
+
+def test_cron_far_ahead_dates():
+    assert next_run('0 0 29 2 *', 2026, 10, 19, 0, 0) == datetime(2028, 2, 29, 0, 0)
+    assert next_run('0 0 29 2 *', 2096, 3, 1, 0, 0) == datetime(2104, 2, 29, 0, 0)
+    with pytest.raises(ValueError):
+        CronSchedule('0 0 31 2 *').next_after(at(2026, 10, 19))
+    with pytest.raises(ValueError):
+        CronSchedule('61 * * * *')
+
+
+def wait_idle(job):
+    for _ in range(200):
+        if not job.running and job.lock.acquire(blocking=False):
+            job.lock.release()
+            return
+        threading.Event().wait(0.01)
+    raise AssertionError(f"El trabajo {job.name} no terminó")
+
+
+def test_interval_job_runs_when_due(clock):
+    clock.now = 1000.0
+    runs = []
+    job = Job('ingest1', 'ingest_service1', IntervalSchedule(60), run=lambda: runs.append(clock()))
+    scheduler = Scheduler([job], clock=clock)
+
+    assert scheduler.tick() == 60
+    assert runs == []
+    clock.now = 1060.0
+    assert scheduler.tick() == 60
+    wait_idle(job)
+    clock.now = 1125.0
+    scheduler.tick()
+    wait_idle(job)
+    assert runs == [1060.0, 1125.0]
+    assert job.status()['runs'] == 2
+    assert job.next_run == 1185.0
+
+
+def test_cron_job_runs_on_schedule(clock):
+    clock.now = at(2026, 10, 19, 10, 5)
+    runs = []
+    job = jobs_from_config([{'name': 'etl', 'module': 'etl_service', 'cron': '30 * * * *'}])[0]
+    job.run = lambda: runs.append(clock())
+    scheduler = Scheduler([job], clock=clock)
+
+    assert scheduler.tick() == 25 * 60
+    clock.now = at(2026, 10, 19, 10, 30)
+    scheduler.tick()
+    wait_idle(job)
+    assert runs == [at(2026, 10, 19, 10, 30)]
+    assert job.next_run == at(2026, 10, 19, 11, 30)
+
+
+def test_running_job_is_not_started_again(clock):
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(5)
+
+    job = Job('ingest1', 'ingest_service1', IntervalSchedule(10), run=slow)
+    scheduler = Scheduler([job], clock=clock)
+    clock.now = 10.0
+    scheduler.tick()
+    assert started.wait(5)
+
+    clock.now = 20.0
+    scheduler.tick()
+    clock.now = 30.0
+    scheduler.tick()
+    assert job.skipped == 2
+    assert job.status()['running']
+
+    release.set()
+    wait_idle(job)
+    clock.now = 40.0
+    scheduler.tick()
+    wait_idle(job)
+    assert job.runs == 2
+    assert job.skipped == 2
+
+
+def test_failing_job_does_not_stop_the_scheduler(clock):
+
+    def fail():
+        raise SystemExit(1)
+
+    job = Job('etl', 'etl_service', IntervalSchedule(10), run=fail)
+    scheduler = Scheduler([job], clock=clock)
+    clock.now = 10.0
+    scheduler.tick()
+    wait_idle(job)
+    assert job.last_status == 'error'
+    assert scheduler.metrics()['jobs']['etl']['failures'] == 1
+
+
+def test_run_forever_with_fake_time(clock):
+    stop = threading.Event()
+    runs = []
+    job = Job('ingest1', 'ingest_service1', IntervalSchedule(30), run=lambda: runs.append(clock()))
+
+    def sleep(seconds):
+        wait_idle(job)
+        clock.now += seconds
+        if clock.now >= 100:
+            stop.set()
+
+    Scheduler([job], clock=clock, sleep=sleep).run_forever(stop)
+    assert runs == [30.0, 60.0, 90.0]
@@ -0,0 +1,206 @@
+import io
+import logging
+import os
+import time
+
+import boto3
+import pytest
+from moto import mock_aws
+
+from conftest import FakeCursor, FakePool
+from sinks import LocalFileSink, MySQLSink, create_sinks, fan_out, transform_pages
+
+
+@mock_aws
+def test_s3_sink_replaces_previous_export_parts():
+    session = boto3.Session(region_name='us-east-1')
+    s3 = session.client('s3')
+    s3.create_bucket(Bucket='data')
+    for key in ('ingest-service-1/orders-part-00000.csv', 'ingest-service-1/orders-part-00001.csv',
+                'ingest-service-1/orders_archive.csv'):
+        s3.put_object(Bucket='data', Key=key, Body=b'old\n')
+
+    [sink] = create_sinks('s3', session, 'data', 'ingest-service-1', 'orders')
+    sink.write_batch([{'id': 'a'}])
+    sink.close()
+
+    keys = sorted(obj['Key'] for obj in s3.list_objects_v2(Bucket='data')['Contents'])
+    assert keys == ['ingest-service-1/orders.csv', 'ingest-service-1/orders_archive.csv']
+    assert s3.get_object(Bucket='data', Key='ingest-service-1/orders.csv')['Body'].read() == b'id\na\n'
+
+
+class RecordingSink:
+    def __init__(self, name, delay=0.0):
+        self.name = name
+        self.delay = delay
+        self.items = []
+        self.closed_at = None
+        self.aborted = False
+
+    def write_batch(self, items):
+        time.sleep(self.delay)
+        self.items.extend(items)
+
+    def close(self):
+        self.closed_at = time.monotonic()
+
+    def abort(self):
+        self.aborted = True
+
+
+def test_fan_out_delivers_every_batch():
+    sinks = [RecordingSink('a'), RecordingSink('b')]
+    results = fan_out(([{'n': i}] for i in range(20)), sinks, buffer_batches=2, max_stall=5)
+    assert all(sink.items == [{'n': i} for i in range(20)] for sink in sinks)
+    assert results['a'] == {'rows': 20, 'seconds': results['a']['seconds'], 'error': None}
+
+
+def test_slow_sink_is_detached_without_delaying_the_rest():
+    slow = RecordingSink('slow', delay=2.0)
+    fast = RecordingSink('fast')
+    start = time.monotonic()
+    results = fan_out(([{'n': i}] for i in range(5)), [slow, fast], buffer_batches=1, max_stall=0.2)
+    elapsed = time.monotonic() - start
+
+    assert len(fast.items) == 5
+    assert fast.closed_at - start < 1.0
+    assert elapsed < 1.0
+    assert 'bloqueado' in results['slow']['error']
+    assert results['fast']['error'] is None
+
+    # El sink lento termina su lote en curso y se aborta sin publicar
+    time.sleep(2.5)
+    assert slow.aborted and slow.closed_at is None
+
+
+def test_producer_error_aborts_every_sink():
+    def batches():
+        yield [{'n': 1}]
+        raise RuntimeError('scan interrumpido')
+
+    sinks = [RecordingSink('a'), RecordingSink('b')]
+    with pytest.raises(RuntimeError):
+        fan_out(batches(), sinks, buffer_batches=1, max_stall=1)
+    assert all(sink.aborted and sink.closed_at is None for sink in sinks)
+
+
+def test_transform_pages_reports_sampled_page_details(caplog):
+    pages = [[{'id': str(i)}] * 2 for i in range(150)]
+    with caplog.at_level(logging.DEBUG, logger='sinks'):
+        rows = sum(len(items) for items in transform_pages(pages, list, label='Scan de t'))
+    assert rows == 300
+    messages = [r.getMessage() for r in caplog.records if r.name == 'sinks']
+    assert [m for m in messages if 'muestra' in m] == [
+        'Scan de t (muestra 1/100): página 1: 2 elementos leídos, 2 filas',
+        'Scan de t (muestra 1/100): página 101: 2 elementos leídos, 2 filas',
+    ]
+    assert messages[-1].startswith('Scan de t completado: 300 en')
+
+
+def test_mysql_sink_streams_batches_to_the_etl_loader(monkeypatch):
+    import etl_service
+
+    calls = []
+
+    def fake_load(columns, batches, table_name, key_columns=None, pool=None):
+        # Los lotes llegan mientras se escriben; las columnas crecen con ellos
+        rows = [list(batch) for batch in batches]
+        calls.append((list(columns), rows, table_name, key_columns, pool))
+        return {'table': table_name, 'rows': 2, 'seconds': 0.0}
+
+    monkeypatch.setattr(etl_service, 'load_rows_to_mysql', fake_load)
+    monkeypatch.setattr(etl_service, 'get_mysql_pool', lambda: 'pool')
+
+    sink = MySQLSink('ingest_service_1_orders', key_columns=['id'])
+    sink.write_batch([{'id': 'a', 'total': 1.5}])
+    sink.write_batch([{'id': 'b', 'status': None}])
+    sink.close()
+    assert calls == [(['id', 'total', 'status'], [[('a', '1.5')], [('b', None, None)]],
+                      'ingest_service_1_orders', ['id'], 'pool')]
+
+    monkeypatch.setattr(etl_service, 'load_rows_to_mysql', lambda columns, batches, *args, **kwargs: list(batches) and None)
+    sink = MySQLSink('ingest_service_1_orders')
+    sink.write_batch([{'id': 'a'}])
+    with pytest.raises(RuntimeError):
+        sink.close()
+
+
+def test_mysql_sink_adds_new_columns_during_the_load(monkeypatch):
+    import etl_service
+
+    cursor = FakeCursor()
+    pool = FakePool(cursor_factory=lambda: cursor)
+    monkeypatch.setattr(etl_service, 'get_mysql_pool', lambda: pool)
+    monkeypatch.setenv('MYSQL_LOAD_MODE', 'append')
+
+    sink = MySQLSink('t')
+    sink.write_batch([{'id': 'a'}])
+    sink.write_batch([{'id': 'b', 'extra': 2}])
+    sink.close()
+    assert sink.result['rows'] == 2
+    assert 'ALTER TABLE `t` ADD COLUMN `extra` TEXT' in cursor.statements
+    assert cursor.inserted['t'] == [('a',), ('b', '2')]
+    assert pool.connections[0].commits == 1
+
+
+class SlowCursor(FakeCursor):
+    def executemany(self, sql, rows):
+        time.sleep(0.3)
+        super().executemany(sql, rows)
+
+
+def test_slow_mysql_load_applies_backpressure_and_is_rolled_back(monkeypatch):
+    import etl_service
+
+    pool = FakePool(cursor_factory=SlowCursor)
+    monkeypatch.setattr(etl_service, 'get_mysql_pool', lambda: pool)
+    monkeypatch.setenv('MYSQL_LOAD_MODE', 'append')
+
+    sink = MySQLSink('t', buffer_batches=1)
+    results = fan_out(([{'id': str(i)}] for i in range(20)), [sink], buffer_batches=1, max_stall=0.2)
+    assert 'bloqueado' in results['mysql']['error']
+
+    sink.loader.join(timeout=5)
+    [conn] = pool.connections
+    assert (conn.commits, conn.rollbacks, pool.in_use) == (0, 1, 0)
+    assert sink.result is None
+
+
+class SlowClosingSink(RecordingSink):
+    def close(self):
+        time.sleep(2.0)
+        super().close()
+
+
+def test_sink_close_time_is_bounded():
+    slow = SlowClosingSink('slow')
+    start = time.monotonic()
+    results = fan_out(([{'n': i}] for i in range(3)), [slow, RecordingSink('fast')], max_stall=1, close_timeout=0.2)
+    assert time.monotonic() - start < 1.0
+    assert 'cierre' in results['slow']['error']
+    assert results['fast']['error'] is None
+
+
+@pytest.mark.parametrize('file_format', ['csv', 'json'])
+def test_local_sink_writes_the_same_file_as_a_single_pass(tmp_path, file_format):
+    from dynamodb_export import encode_items
+
+    batches = [[{'id': 'a', 'n': 1}], [{'id': 'b', 'blob': b'\x00'}], [{'id': 'c', 'n': 2.5}]]
+    if file_format == 'json':
+        batches[1] = [{'id': 'b', 'tags': ['x']}]
+    sink = LocalFileSink(str(tmp_path / 'out' / f'orders.{file_format}'), file_format)
+    for batch in batches:
+        sink.write_batch(batch)
+    sink.close()
+
+    expected = io.StringIO()
+    encode_items([item for batch in batches for item in batch], expected, file_format)
+    assert (tmp_path / 'out' / f'orders.{file_format}').read_text(encoding='utf-8') == expected.getvalue()
+    assert os.listdir(tmp_path / 'out') == [f'orders.{file_format}']
+
+
+def test_aborted_local_sink_writes_nothing(tmp_path):
+    sink = LocalFileSink(str(tmp_path / 'orders.csv'))
+    sink.write_batch([{'id': 'a'}])
+    sink.abort()
+    assert os.listdir(tmp_path) == []